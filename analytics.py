@@ -0,0 +1,834 @@
+"""
+Analytics engine for the Marketing Intelligence Dashboard.
+
+Pure functions over the partitioned daily cube and date-sorted business
+frame that return typed results: the KPI bundle, per-platform/tactic/state
+summaries, the trend series at a chosen time grain, the top campaigns and
+the insights list. Every view takes one FilterSpec holding the rerun's
+date window and dimension selection. Nothing here depends on Streamlit, so
+results can be cached, computed in parallel, benchmarked or produced by
+batch jobs; the dashboard only renders them.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CUBE_DIMENSIONS, CUBE_MEASURES, UNKNOWN_LABEL, build_partition_index
+from instrumentation import start_stages
+from metrics import BUSINESS_RATIOS, MARKETING_RATIOS, add_ratios, ratio
+
+# Why a result holds no rows
+STATUS_OK = 'ok'
+STATUS_NO_DATA = 'no_data'
+STATUS_NO_DATA_IN_RANGE = 'no_data_in_range'
+
+# Slices of the cube that get their own cumulative arrays; the
+# platform x tactic grid serves KPI cards when both filters are narrowed
+MARKETING_PREFIX_SLICES = [(), ('platform',), ('tactic',), ('state',), ('platform', 'tactic')]
+BUSINESS_PREFIX_MEASURES = ['orders', 'total_revenue', 'gross_profit', 'rows']
+
+# Time grains of the trend series as pandas period frequencies; weeks run
+# Monday to Sunday
+TREND_GRAINS = {'day': 'D', 'week': 'W', 'month': 'M', 'quarter': 'Q'}
+
+# The auto grain is the finest one that splits the window into at most
+# this many periods
+AUTO_GRAIN_MAX_PERIODS = 180
+
+# Dimensions of a campaign cell; a campaign is ranked on the total of its
+# cells that the platform and tactic filters keep
+CAMPAIGN_CELL_DIMENSIONS = ['platform', 'tactic', 'campaign']
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """Date window and platform/tactic selection, normalized so equal selections compare equal
+
+    A dimension is None when every one of its values is selected, so it
+    costs nothing to apply; the spec doubles as the view cache key.
+    row_ranges are the cube rows of the (platform, month) partitions that
+    survive pruning, one date-sorted range per platform's adjacent months.
+    """
+    start_date: pd.Timestamp
+    end_date: pd.Timestamp
+    row_ranges: tuple
+    platforms: tuple = None
+    tactics: tuple = None
+
+    @property
+    def date_range(self):
+        return (self.start_date, self.end_date)
+
+    @property
+    def selection(self):
+        """Dimensions that exclude some of their values, mapped to the values kept"""
+        selection = {'platform': self.platforms, 'tactic': self.tactics}
+        return {dim: values for dim, values in selection.items() if values is not None}
+
+    @property
+    def selects_nothing(self):
+        return any(len(values) == 0 for values in self.selection.values())
+
+
+@dataclass(frozen=True)
+class KpiBundle:
+    """Headline marketing and business KPIs over a date window; ratios are of the window totals"""
+    total_spend: float
+    total_revenue: float
+    total_impressions: int
+    total_clicks: int
+    roas: float
+    ctr: float
+    cpc: float
+    cpm: float
+    business_revenue: float
+    business_orders: int
+    business_profit: float
+    aov: float
+    profit_margin: float
+    attribution_rate: float
+    conversion_rate: float
+
+
+@dataclass(frozen=True)
+class DimensionSummary:
+    """Totals and ratios per value of one cube dimension, indexed by that value"""
+    dimension: str
+    table: pd.DataFrame
+    status: str = STATUS_OK
+
+
+@dataclass(frozen=True)
+class TrendSeries:
+    """Marketing and business totals per period of a time grain, each period dated by its first day in the window"""
+    marketing: pd.DataFrame
+    business: pd.DataFrame
+    grain: str = 'day'
+    status: str = STATUS_OK
+
+
+def date_range_offsets(df, selected_date_range):
+    """Binary-search the row offsets spanned by a date range in a date-sorted frame"""
+    # The sorted 'date' column is the index: the first row of a date is its
+    # left insertion point and the row after its last is its right one
+    dates = df['date'].to_numpy()
+    start_date = pd.to_datetime(selected_date_range[0]).to_datetime64()
+    end_date = pd.to_datetime(selected_date_range[1]).to_datetime64()
+
+    start = dates.searchsorted(start_date, side='left')
+    stop = dates.searchsorted(end_date, side='right')
+    return start, max(start, stop)
+
+
+def filter_date_range(df, selected_date_range):
+    """Slice the rows of a date-sorted frame inside the selected range"""
+    start, stop = date_range_offsets(df, selected_date_range)
+    return df.iloc[start:stop]
+
+
+def data_date_bounds(kpi_prefix_sums):
+    """First and last day holding marketing data"""
+    prefix_sums = kpi_prefix_sums['marketing']
+    first_date = prefix_sums['start_date']
+    return first_date, first_date + pd.Timedelta(days=max(prefix_sums['num_days'] - 1, 0))
+
+
+def prune_partitions(partitions, start_date, end_date, platforms=None):
+    """Row ranges of the partitions overlapping the window on the selected platforms"""
+    months = partitions['month'].to_numpy()
+    keep = ((months >= start_date.to_datetime64().astype('datetime64[M]'))
+            & (months <= end_date.to_datetime64().astype('datetime64[M]')))
+    if platforms is not None:
+        keep &= partitions['platform'].isin(platforms).to_numpy()
+
+    # A platform's months are adjacent rows, so its kept months join up;
+    # ranges never span platforms, as each must stay date-sorted for
+    # select_cells to trim it by binary search
+    ranges = []
+    previous_platform = None
+    for platform, start, stop in zip(
+        partitions['platform'].to_numpy()[keep],
+        partitions['start'].to_numpy()[keep],
+        partitions['stop'].to_numpy()[keep]
+    ):
+        if ranges and ranges[-1][1] == start and platform == previous_platform:
+            ranges[-1] = (ranges[-1][0], int(stop))
+        else:
+            ranges.append((int(start), int(stop)))
+        previous_platform = platform
+    return tuple(ranges)
+
+
+def make_filter_spec(kpi_prefix_sums, selected_date_range, platforms, tactics):
+    """Normalize the sidebar selections against the data and prune the cube partitions they rule out"""
+    labels = kpi_prefix_sums['marketing']['labels']
+    first_date, last_date = data_date_bounds(kpi_prefix_sums)
+    start_date = max(pd.Timestamp(selected_date_range[0]), first_date)
+    end_date = min(pd.Timestamp(selected_date_range[1]), last_date)
+
+    def dimension_selection(dim, values):
+        # Selecting every value is the same as not filtering on the dimension
+        if set(labels[dim]) <= set(values):
+            return None
+        return tuple(sorted(values))
+
+    platform_selection = dimension_selection('platform', platforms)
+    return FilterSpec(
+        start_date=start_date,
+        end_date=end_date,
+        row_ranges=prune_partitions(kpi_prefix_sums['partitions'], start_date, end_date, platform_selection),
+        platforms=platform_selection,
+        tactics=dimension_selection('tactic', tactics)
+    )
+
+
+def select_cells(cube, filter_spec):
+    """Cube cells matching a filter spec, reading only the partitions it kept
+
+    A view rather than a copy when the kept cells are one run of rows, e.g.
+    one platform or every platform over all dates.
+    """
+    # Each range is one platform's date-sorted months, trimmed to the
+    # window by binary search; ranges left touching are joined again
+    dates = cube['date'].to_numpy()
+    start_date = filter_spec.start_date.to_datetime64()
+    end_date = filter_spec.end_date.to_datetime64()
+    ranges = []
+    for start, stop in filter_spec.row_ranges:
+        window = dates[start:stop]
+        first = start + window.searchsorted(start_date, side='left')
+        last = start + window.searchsorted(end_date, side='right')
+        if ranges and ranges[-1][1] == first:
+            ranges[-1] = (ranges[-1][0], last)
+        elif last > first:
+            ranges.append((first, last))
+
+    if len(ranges) == 1:
+        cells = cube.iloc[ranges[0][0]:ranges[0][1]]
+    else:
+        # Several runs (or none) are gathered into one frame
+        rows = [np.arange(first, last) for first, last in ranges]
+        cells = cube.take(np.concatenate(rows) if rows else np.empty(0, dtype='int64'))
+
+    # Platforms were pruned with the partitions; a narrowed tactic selection
+    # looks each row's category code up in a per-value keep table
+    if filter_spec.tactics is None:
+        return cells
+    codes, labels = dimension_codes(cells['tactic'])
+    keep = np.append(labels.isin(filter_spec.tactics), False)
+    return cells[keep[codes]]
+
+
+def summarize_cube(cube, by, columns):
+    """Aggregate cube cells by one dimension and derive the ratios of the totals"""
+    summary = cube.groupby(by, observed=True)[CUBE_MEASURES].sum()
+    return add_ratios(summary, MARKETING_RATIOS)[columns]
+
+
+def dimension_codes(column):
+    """Integer codes and labels of a dimension column, in label order"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+
+    values = column.to_numpy()
+    if column.is_monotonic_increasing:
+        # Sorted columns (e.g. the cube's dates) are coded by their runs
+        starts = np.empty(len(values), dtype=bool)
+        starts[:1] = True
+        starts[1:] = values[1:] != values[:-1]
+        return np.cumsum(starts) - 1, pd.Index(values[starts])
+    return pd.factorize(column, sort=True)
+
+
+def aggregate_dimensions(cube, dimensions, measures=CUBE_MEASURES):
+    """Totals per value of every dimension from a single bincount pass over the cube
+
+    Each dimension's integer codes are shifted into their own block of one
+    shared index, so every measure is accumulated for all dimensions by a
+    single np.bincount. Returns one frame per dimension, indexed by its
+    values with no empty rows, with the ratios of the totals derived.
+    """
+    codes = []
+    labels = []
+    offsets = [0]
+    for dim in dimensions:
+        dim_codes, dim_labels = dimension_codes(cube[dim])
+        codes.append(dim_codes + offsets[-1])
+        labels.append(dim_labels)
+        offsets.append(offsets[-1] + len(dim_labels))
+
+    flat_index = np.concatenate(codes) if codes else np.empty(0, dtype='int64')
+    totals = {
+        measure: np.bincount(
+            flat_index,
+            weights=np.tile(cube[measure].to_numpy(dtype='float64'), len(dimensions)),
+            minlength=offsets[-1]
+        )
+        for measure in measures
+    }
+
+    summaries = {}
+    for i, dim in enumerate(dimensions):
+        summary = pd.DataFrame(
+            {measure: totals[measure][offsets[i]:offsets[i + 1]] for measure in measures},
+            index=pd.Index(labels[i], name=dim)
+        )
+        summaries[dim] = add_ratios(summary[summary['rows'] > 0], MARKETING_RATIOS)
+
+    return summaries
+
+
+def build_kpi_prefix_sums(marketing_cube, business_df, marketing_df=None, campaign_index=None):
+    """Cumulative daily totals so KPI cards answer any date window in O(1), plus the cube's partition index
+
+    With the raw marketing rows the campaign index is built too, unless the
+    caller keeps one current (see extend_campaign_index); without them
+    (e.g. in streaming mode) it is None.
+    """
+    if campaign_index is None and marketing_df is not None:
+        campaign_index = build_campaign_index(marketing_df)
+
+    return {
+        'marketing': build_prefix_sums(marketing_cube, CUBE_MEASURES, MARKETING_PREFIX_SLICES),
+        'business': build_prefix_sums(business_df.assign(rows=1), BUSINESS_PREFIX_MEASURES),
+        'partitions': build_partition_index(marketing_cube),
+        'campaigns': campaign_index
+    }
+
+
+def build_prefix_sums(df, measures, slices=((),)):
+    """Build per-day cumulative sums of the measures for the total and each dimension slice"""
+    if df.empty:
+        start_date, num_days = pd.Timestamp(0), 0
+    else:
+        start_date = df['date'].min()
+        num_days = (df['date'].max() - start_date).days + 1
+
+    day_offsets = (df['date'] - start_date).dt.days.to_numpy()
+    values = df[measures].to_numpy(dtype='float64')
+    labels = {}
+    cumulative = {}
+
+    for dims in slices:
+        # Flatten the slice's dimension codes into one cell number per row
+        cell_codes = np.zeros(len(df), dtype='int64')
+        num_cells = 1
+        for dim in dims:
+            dim_codes, dim_labels = pd.factorize(df[dim], sort=True)
+            labels[dim] = list(dim_labels)
+            cell_codes = cell_codes * len(dim_labels) + dim_codes
+            num_cells *= len(dim_labels)
+
+        # Daily totals per cell, accumulated along the day axis behind a zero row
+        flat_index = day_offsets * num_cells + cell_codes
+        daily = np.stack([
+            np.bincount(flat_index, weights=values[:, i], minlength=num_days * num_cells)
+            for i in range(len(measures))
+        ], axis=-1).reshape(num_days, num_cells, len(measures))
+
+        cumsum = np.zeros((num_days + 1, num_cells, len(measures)))
+        np.cumsum(daily, axis=0, out=cumsum[1:])
+        cumulative[tuple(dims)] = cumsum
+
+    return {
+        'start_date': start_date,
+        'num_days': num_days,
+        'measures': list(measures),
+        'labels': labels,
+        'cumulative': cumulative
+    }
+
+
+def build_campaign_index(marketing_df):
+    """Cumulative monthly totals per (platform, tactic, campaign) cell of the date-sorted raw rows
+
+    Campaigns are too many for daily cumulative arrays, so the month axis
+    holds the whole months of a window and the raw rows of the months cut
+    by it are added at query time (see campaign_window_totals). Each row's
+    cell is kept so those rows are summed without looking their keys up.
+    Returns None when there are no raw rows.
+    """
+    if marketing_df.empty:
+        return None
+    return extend_campaign_index(None, marketing_df)
+
+
+def extend_campaign_index(campaign_index, new_rows):
+    """A campaign index that also covers rows appended after the ones it indexes
+
+    The new rows' monthly totals are added to every cumulative row from
+    their month onward and unseen cells get new columns, so the cost
+    tracks the new rows and the size of the index rather than every row.
+    The new rows must follow the indexed ones in the date-sorted frame.
+    The given index is left unchanged.
+    """
+    if new_rows.empty:
+        return campaign_index
+
+    # One cell number per new row from the dimensions' integer codes
+    flat_codes = np.zeros(len(new_rows), dtype='int64')
+    dim_labels = []
+    for dim in CAMPAIGN_CELL_DIMENSIONS:
+        dim_codes, labels = labelled_codes(new_rows[dim])
+        flat_codes = flat_codes * len(labels) + dim_codes
+        dim_labels.append(labels)
+    cell_keys, row_cells = np.unique(flat_codes, return_inverse=True)
+    key_codes = np.unravel_index(cell_keys, [len(labels) for labels in dim_labels])
+    new_cells = [np.asarray(labels, dtype=object)[codes] for labels, codes in zip(dim_labels, key_codes)]
+
+    months = new_rows['date'].to_numpy().astype('datetime64[M]')
+    if campaign_index is None:
+        campaign_index = {
+            'start_month': months.min(),
+            'num_months': 0,
+            'cell_platforms': np.empty(0, dtype=object),
+            'cell_tactics': np.empty(0, dtype=object),
+            'cell_campaigns': np.empty(0, dtype='int64'),
+            'campaigns': pd.Index([], dtype=object),
+            'row_cells': np.empty(0, dtype='int32'),
+            'cumulative': np.zeros((1, 0, len(CUBE_MEASURES)))
+        }
+
+    # Cells already indexed keep their numbers; unseen ones follow them
+    campaigns = campaign_index['campaigns']
+    known_cells = pd.MultiIndex.from_arrays([
+        campaign_index['cell_platforms'],
+        campaign_index['cell_tactics'],
+        np.asarray(campaigns, dtype=object)[campaign_index['cell_campaigns']]
+    ])
+    cell_numbers = known_cells.get_indexer(pd.MultiIndex.from_arrays(new_cells))
+    unseen = cell_numbers < 0
+    cell_numbers[unseen] = len(known_cells) + np.arange(unseen.sum())
+
+    unseen_campaigns = pd.Index(new_cells[2][unseen]).unique()
+    campaigns = campaigns.append(unseen_campaigns[~unseen_campaigns.isin(campaigns)])
+    cell_campaigns = np.concatenate([campaign_index['cell_campaigns'], campaigns.get_indexer(new_cells[2][unseen])])
+    row_cells = cell_numbers[row_cells]
+
+    month_offsets = (months - campaign_index['start_month']).astype('int64')
+    indexed_months = campaign_index['num_months']
+    num_months = max(indexed_months, int(month_offsets.max()) + 1)
+    num_cells = len(known_cells) + int(unseen.sum())
+
+    # The indexed totals carry on into new months and are zero for new cells
+    indexed = campaign_index['cumulative']
+    cumulative = np.zeros((num_months + 1, num_cells, len(CUBE_MEASURES)))
+    cumulative[:indexed_months + 1, :len(known_cells)] = indexed
+    cumulative[indexed_months + 1:, :len(known_cells)] = indexed[-1]
+
+    # Each new row then counts in every cumulative row after its month;
+    # months before the first new one are untouched
+    first_month = int(month_offsets.min())
+    flat_index = (month_offsets - first_month) * num_cells + row_cells
+    values = campaign_row_values(new_rows)
+    monthly = np.stack([
+        np.bincount(flat_index, weights=values[:, i], minlength=(num_months - first_month) * num_cells)
+        for i in range(len(CUBE_MEASURES))
+    ], axis=-1).reshape(num_months - first_month, num_cells, len(CUBE_MEASURES))
+    cumulative[first_month + 1:] += np.cumsum(monthly, axis=0)
+
+    return {
+        'start_month': campaign_index['start_month'],
+        'num_months': num_months,
+        'cell_platforms': np.concatenate([campaign_index['cell_platforms'], new_cells[0][unseen]]),
+        'cell_tactics': np.concatenate([campaign_index['cell_tactics'], new_cells[1][unseen]]),
+        'cell_campaigns': cell_campaigns,
+        'campaigns': campaigns,
+        'row_cells': np.concatenate([campaign_index['row_cells'], row_cells.astype('int32')]),
+        'cumulative': cumulative
+    }
+
+
+def labelled_codes(column):
+    """dimension_codes with missing values coded as the Unknown label
+
+    A missing value's code is -1, which would otherwise land in a
+    neighbouring cell once the codes are flattened.
+    """
+    codes, labels = dimension_codes(column)
+    missing = codes < 0
+    if missing.any():
+        if UNKNOWN_LABEL not in labels:
+            labels = labels.append(pd.Index([UNKNOWN_LABEL]))
+        codes = np.where(missing, labels.get_loc(UNKNOWN_LABEL), codes)
+    return codes, labels
+
+
+def campaign_row_values(marketing_df):
+    """The cube measures of raw marketing rows as one float64 array, each row counting 1 in 'rows'"""
+    values = np.ones((len(marketing_df), len(CUBE_MEASURES)))
+    for i, measure in enumerate(CUBE_MEASURES):
+        if measure != 'rows':
+            values[:, i] = marketing_df[measure].to_numpy(dtype='float64')
+    return values
+
+
+def prefix_day_bounds(prefix_sums, selected_date_range):
+    """Rows of the cumulative day axis that bound a date range"""
+    start_date = pd.to_datetime(selected_date_range[0])
+    end_date = pd.to_datetime(selected_date_range[1])
+    num_days = prefix_sums['num_days']
+
+    start = min(max((start_date - prefix_sums['start_date']).days, 0), num_days)
+    stop = min(max((end_date - prefix_sums['start_date']).days + 1, start), num_days)
+    return start, stop
+
+
+def selected_cumulative(prefix_sums, selection=None):
+    """Cumulative array of the coarsest slice answering a selection, and the mask of its selected cells"""
+    # Only dimensions that exclude some of their values need a finer slice
+    restricted = {
+        dim: set(values) for dim, values in (selection or {}).items()
+        if not set(prefix_sums['labels'][dim]) <= set(values)
+    }
+    dims = tuple(dim for dim in CUBE_DIMENSIONS if dim in restricted)
+
+    cell_mask = np.ones(1, dtype=bool)
+    for dim in dims:
+        dim_mask = np.array([label in restricted[dim] for label in prefix_sums['labels'][dim]])
+        cell_mask = np.outer(cell_mask, dim_mask).ravel()
+
+    return prefix_sums['cumulative'][dims], cell_mask
+
+
+def prefix_range_totals(prefix_sums, selected_date_range, selection=None):
+    """Sum the measures over a date range, optionally restricted to some dimension values"""
+    # Two row lookups bound the window on the cumulative day axis
+    start, stop = prefix_day_bounds(prefix_sums, selected_date_range)
+    cumsum, cell_mask = selected_cumulative(prefix_sums, selection)
+    window = cumsum[stop] - cumsum[start]
+
+    return pd.Series(window[cell_mask].sum(axis=0), index=prefix_sums['measures'])
+
+
+def prefix_rollup(prefix_sums, selected_date_range, grain, selection=None):
+    """Sum the measures per period of a time grain over a date range
+
+    The cumulative arrays are a rollup at every grain at once: a period's
+    totals are the difference of the rows at its bounds, so a multi-year
+    range costs one lookup per week, month or quarter rather than a pass
+    over the daily cells, and periods cut by the range count only its days.
+    Periods without any rows are left out.
+    """
+    start, stop = prefix_day_bounds(prefix_sums, selected_date_range)
+    days = prefix_sums['start_date'] + pd.to_timedelta(np.arange(start, stop), unit='D')
+
+    # A period starts on each day whose period differs from the day before
+    periods = days.to_period(TREND_GRAINS[grain]).asi8
+    firsts = np.flatnonzero(np.diff(periods, prepend=periods[:1] - 1))
+    bounds = start + np.append(firsts, len(days))
+
+    cumsum, cell_mask = selected_cumulative(prefix_sums, selection)
+    totals = np.diff(cumsum[bounds][:, cell_mask].sum(axis=1), axis=0)
+
+    rollup = pd.DataFrame(totals, columns=prefix_sums['measures'])
+    rollup.insert(0, 'date', days[firsts])
+    return rollup[rollup['rows'] > 0].reset_index(drop=True)
+
+
+def choose_grain(filter_spec):
+    """Finest time grain that splits the window into at most AUTO_GRAIN_MAX_PERIODS periods"""
+    num_days = (filter_spec.end_date - filter_spec.start_date).days + 1
+    for grain, period_days in (('day', 1), ('week', 7), ('month', 31)):
+        if num_days <= AUTO_GRAIN_MAX_PERIODS * period_days:
+            return grain
+    return 'quarter'
+
+
+def compute_kpis(kpi_prefix_sums, filter_spec):
+    """KPIs for the selected window and filters, or None when the selection holds no data"""
+    selection = filter_spec.selection
+    all_dates = (kpi_prefix_sums['marketing']['start_date'], pd.Timestamp.max)
+
+    if (prefix_range_totals(kpi_prefix_sums['marketing'], all_dates, selection)['rows'] == 0
+            or kpi_prefix_sums['business']['num_days'] == 0):
+        return None
+
+    # Window totals straight from the cumulative arrays, with every ratio
+    # derived from those totals
+    marketing_totals = add_ratios(
+        prefix_range_totals(kpi_prefix_sums['marketing'], filter_spec.date_range, selection), MARKETING_RATIOS
+    )
+    business_totals = add_ratios(
+        prefix_range_totals(kpi_prefix_sums['business'], filter_spec.date_range), BUSINESS_RATIOS
+    )
+
+    return KpiBundle(
+        total_spend=marketing_totals['spend'],
+        total_revenue=marketing_totals['attributed_revenue'],
+        total_impressions=int(marketing_totals['impressions']),
+        total_clicks=int(marketing_totals['clicks']),
+        roas=marketing_totals['roas'],
+        ctr=marketing_totals['ctr'],
+        cpc=marketing_totals['cpc'],
+        cpm=marketing_totals['cpm'],
+        business_revenue=business_totals['total_revenue'],
+        business_orders=int(business_totals['orders']),
+        business_profit=business_totals['gross_profit'],
+        aov=business_totals['aov'],
+        profit_margin=business_totals['profit_margin'],
+        attribution_rate=ratio(marketing_totals['attributed_revenue'], business_totals['total_revenue'], 100),
+        conversion_rate=marketing_totals['ctr']
+    )
+
+
+def summarize_dimension(marketing_cube, filter_spec, dimension, columns, sort_by=None, view=None):
+    """Summarize the cube cells selected by the filter spec by one dimension"""
+    if marketing_cube.empty or filter_spec.selects_nothing:
+        return DimensionSummary(dimension, pd.DataFrame(), STATUS_NO_DATA)
+
+    timer = start_stages(view or dimension)
+    cube_filtered = select_cells(marketing_cube, filter_spec)
+    timer.lap('filter')
+
+    if len(cube_filtered) == 0:
+        return DimensionSummary(dimension, pd.DataFrame(), STATUS_NO_DATA_IN_RANGE)
+
+    table = summarize_cube(cube_filtered, dimension, columns).round(2)
+    if sort_by is not None:
+        table = table.sort_values(sort_by, ascending=False)
+    timer.lap('aggregate')
+
+    return DimensionSummary(dimension, table)
+
+
+def summarize_platforms(marketing_cube, filter_spec):
+    """Platform performance summary"""
+    return summarize_dimension(
+        marketing_cube, filter_spec, 'platform',
+        ['spend', 'attributed_revenue', 'impressions', 'clicks', 'roas', 'ctr'],
+        view='platform_comparison'
+    )
+
+
+def summarize_tactics(marketing_cube, filter_spec):
+    """Tactic performance summary, best ROAS first"""
+    return summarize_dimension(
+        marketing_cube, filter_spec, 'tactic',
+        ['spend', 'attributed_revenue', 'roas', 'ctr', 'impressions', 'clicks'],
+        sort_by='roas', view='tactic_analysis'
+    )
+
+
+def summarize_states(marketing_cube, filter_spec):
+    """State performance summary, highest spend first"""
+    return summarize_dimension(
+        marketing_cube, filter_spec, 'state',
+        ['spend', 'attributed_revenue', 'roas', 'ctr', 'impressions', 'clicks'],
+        sort_by='spend', view='geographic_analysis'
+    )
+
+
+def compute_trend_series(kpi_prefix_sums, filter_spec, grain='day'):
+    """Marketing totals and ratios alongside business totals per period of the window"""
+    if (kpi_prefix_sums['marketing']['num_days'] == 0 or kpi_prefix_sums['business']['num_days'] == 0
+            or filter_spec.selects_nothing):
+        return TrendSeries(pd.DataFrame(), pd.DataFrame(), grain, STATUS_NO_DATA)
+
+    timer = start_stages('trend_analysis')
+    marketing = prefix_rollup(kpi_prefix_sums['marketing'], filter_spec.date_range, grain, filter_spec.selection)
+    business = prefix_rollup(kpi_prefix_sums['business'], filter_spec.date_range, grain)
+    marketing = add_ratios(marketing, MARKETING_RATIOS, ['roas', 'ctr']).round({'roas': 2, 'ctr': 2})
+    timer.lap('aggregate')
+
+    return TrendSeries(marketing, business, grain)
+
+
+def campaign_window_totals(marketing_df, campaign_index, filter_spec):
+    """Measures per campaign cell over the filter spec's window
+
+    Whole months are the difference of two cumulative rows; the days of the
+    months cut by the window are summed from their raw rows, found by
+    binary search in the date-sorted frame.
+    """
+    start_day = filter_spec.start_date.to_datetime64().astype('datetime64[D]')
+    end_day = filter_spec.end_date.to_datetime64().astype('datetime64[D]')
+    first_month = start_day.astype('datetime64[M]')
+    if first_month.astype('datetime64[D]') < start_day:
+        first_month += 1
+    stop_month = (end_day + 1).astype('datetime64[M]')
+
+    num_cells = campaign_index['cumulative'].shape[1]
+    if first_month < stop_month:
+        start, stop = (
+            min(max(int((month - campaign_index['start_month']).astype('int64')), 0), campaign_index['num_months'])
+            for month in (first_month, stop_month)
+        )
+        cumulative = campaign_index['cumulative']
+        totals = cumulative[stop] - cumulative[start]
+        edges = [
+            (start_day, first_month.astype('datetime64[D]') - 1),
+            (stop_month.astype('datetime64[D]'), end_day)
+        ]
+    else:
+        totals = np.zeros((num_cells, len(CUBE_MEASURES)))
+        edges = [(start_day, end_day)]
+
+    for edge in edges:
+        first, last = date_range_offsets(marketing_df, edge)
+        if last > first:
+            rows = marketing_df.iloc[first:last]
+            values = campaign_row_values(rows)
+            cells = campaign_index['row_cells'][first:last]
+            for i in range(len(CUBE_MEASURES)):
+                totals[:, i] += np.bincount(cells, weights=values[:, i], minlength=num_cells)
+
+    return totals
+
+
+def top_k_indices(values, k, ascending=False):
+    """Positions of the k largest (or smallest) values, best first
+
+    argpartition moves the k best values ahead of the rest in linear time,
+    so only those k are sorted.
+    """
+    keys = values if ascending else -values
+    if k < len(keys):
+        best = np.argpartition(keys, k - 1)[:k]
+    else:
+        best = np.arange(len(keys))
+    return best[np.argsort(keys[best], kind='stable')]
+
+
+def rank_campaigns(marketing_df, kpi_prefix_sums, filter_spec, metric='spend', k=10, ascending=False):
+    """Top (or bottom) k campaigns of the selection by spend, attributed revenue or ROAS"""
+    campaign_index = kpi_prefix_sums.get('campaigns')
+    if campaign_index is None or filter_spec.selects_nothing:
+        return DimensionSummary('campaign', pd.DataFrame(), STATUS_NO_DATA)
+
+    timer = start_stages('campaign_drilldown')
+    totals = campaign_window_totals(marketing_df, campaign_index, filter_spec)
+
+    # The platform and tactic filters keep whole cells, which then add up
+    # into their campaigns
+    keep = np.ones(len(totals), dtype=bool)
+    if filter_spec.platforms is not None:
+        keep &= np.isin(campaign_index['cell_platforms'], filter_spec.platforms)
+    if filter_spec.tactics is not None:
+        keep &= np.isin(campaign_index['cell_tactics'], filter_spec.tactics)
+
+    num_campaigns = len(campaign_index['campaigns'])
+    campaign_totals = np.stack([
+        np.bincount(campaign_index['cell_campaigns'][keep], weights=totals[keep, i], minlength=num_campaigns)
+        for i in range(len(CUBE_MEASURES))
+    ], axis=-1)
+    timer.lap('aggregate')
+
+    active = np.flatnonzero(campaign_totals[:, CUBE_MEASURES.index('rows')] > 0)
+    if len(active) == 0:
+        return DimensionSummary('campaign', pd.DataFrame(), STATUS_NO_DATA_IN_RANGE)
+
+    table = pd.DataFrame(
+        campaign_totals[active],
+        columns=CUBE_MEASURES,
+        index=pd.Index(np.asarray(campaign_index['campaigns'], dtype=object)[active], name='campaign')
+    )
+    if metric in MARKETING_RATIOS:
+        numerator, denominator, scale = MARKETING_RATIOS[metric]
+        values = ratio(table[numerator].to_numpy(), table[denominator].to_numpy(), scale)
+    else:
+        values = table[metric].to_numpy()
+
+    table = table.iloc[top_k_indices(values, k, ascending)]
+    table = add_ratios(table, MARKETING_RATIOS)[['spend', 'attributed_revenue', 'roas', 'ctr', 'impressions', 'clicks']]
+    timer.lap('rank')
+
+    return DimensionSummary('campaign', table.round(2))
+
+
+def generate_insights(marketing_cube, business_df, filter_spec):
+    """Generate actionable insights as a list of messages"""
+    if marketing_cube.empty or business_df.empty or filter_spec.selects_nothing:
+        return ["No data available for insights"]
+
+    timer = start_stages('insights')
+    cube_filtered = select_cells(marketing_cube, filter_spec)
+    business_filtered = filter_date_range(business_df, filter_spec.date_range)
+    timer.lap('filter')
+
+    if len(cube_filtered) == 0 or len(business_filtered) == 0:
+        return ["No data available for selected date range"]
+
+    insights = []
+
+    # Every dimension summary the rules need, from one scan of the cube
+    summaries = aggregate_dimensions(cube_filtered, ['platform', 'tactic', 'state', 'date'])
+    daily_totals = summaries['date']
+
+    # Key metrics
+    totals = add_ratios(daily_totals[CUBE_MEASURES].sum(), MARKETING_RATIOS)
+    total_spend = totals['spend']
+    total_revenue = totals['attributed_revenue']
+    avg_roas = totals['roas']
+    avg_ctr = totals['ctr']
+
+    if total_spend > 0:
+        insights.append(f"💰 Performance Summary: ${total_spend:,.0f} spend generated ${total_revenue:,.0f} revenue with {avg_roas:.1f}x ROAS")
+
+    # Platform analysis
+    platform_roas = summaries['platform']['roas'].sort_values(ascending=False)
+    platform_spend = summaries['platform']['spend'].sort_values(ascending=False)
+
+    if len(platform_roas) > 0:
+        best_platform = platform_roas.index[0]
+        best_platform_roas = platform_roas.iloc[0]
+        worst_platform = platform_roas.index[-1]
+        worst_platform_roas = platform_roas.iloc[-1]
+
+        insights.append(f"🏆 Platform Performance: {best_platform} leads with {best_platform_roas:.1f}x ROAS, while {worst_platform} needs optimization at {worst_platform_roas:.1f}x")
+
+    # Tactic analysis
+    tactic_roas = summaries['tactic']['roas'].sort_values(ascending=False)
+
+    if len(tactic_roas) > 0:
+        best_tactic = tactic_roas.index[0]
+        best_tactic_roas = tactic_roas.iloc[0]
+        insights.append(f"🚀 Best Performing Tactic: {best_tactic} delivers {best_tactic_roas:.1f}x ROAS - consider increasing budget allocation")
+
+    # Geographic insights
+    state_roas = summaries['state']['roas'].sort_values(ascending=False)
+
+    if len(state_roas) > 0:
+        best_state = state_roas.index[0]
+        best_state_roas = state_roas.iloc[0]
+        insights.append(f"📍 Geographic Opportunity: {best_state} shows highest ROAS at {best_state_roas:.1f}x - consider expanding presence")
+
+    # Business insights
+    total_business_revenue = business_filtered['total_revenue'].sum()
+    total_business_profit = business_filtered['gross_profit'].sum()
+
+    if total_business_revenue > 0:
+        attribution_rate = ratio(total_revenue, total_business_revenue, 100)
+        profit_margin = ratio(total_business_profit, total_business_revenue, 100)
+        insights.append(f"📊 Business Impact: Marketing drives {attribution_rate:.1f}% of total revenue with {profit_margin:.1f}% profit margin")
+
+    # Efficiency insights
+    if avg_ctr < 2.0:
+        insights.append(f"🔍 Optimization Opportunity: CTR of {avg_ctr:.2f}% is below industry average - focus on ad creative and targeting")
+
+    # Trend insights
+    if len(daily_totals) > 7:
+        # ROAS of the first and last seven days' totals
+        recent = daily_totals.tail(7)[['attributed_revenue', 'spend']].sum()
+        previous = daily_totals.head(7)[['attributed_revenue', 'spend']].sum()
+        recent_roas = ratio(recent['attributed_revenue'], recent['spend'])
+        previous_roas = ratio(previous['attributed_revenue'], previous['spend'])
+        roas_trend = ((recent_roas - previous_roas) / previous_roas * 100) if previous_roas > 0 else 0
+
+        if roas_trend > 5:
+            insights.append(f"📈 Positive Trend: ROAS improved {roas_trend:.1f}% over the period - maintain current strategy")
+        elif roas_trend < -5:
+            insights.append(f"📉 Declining Performance: ROAS decreased {abs(roas_trend):.1f}% - review and optimize campaigns")
+
+    # Budget allocation insights
+    if len(platform_spend) > 1:
+        top_platform_spend = platform_spend.iloc[0]
+        total_platform_spend = platform_spend.sum()
+        top_platform_share = (top_platform_spend / total_platform_spend * 100)
+
+        if top_platform_share > 60:
+            insights.append(f"⚖️ Budget Concentration: {platform_spend.index[0]} receives {top_platform_share:.1f}% of budget - consider diversifying for risk mitigation")
+
+    timer.lap('aggregate')
+    return insights
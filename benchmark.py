@@ -0,0 +1,286 @@
+"""
+Headless benchmark for the Marketing Intelligence Dashboard.
+
+Runs the loading pipeline and every dashboard view outside the Streamlit
+server (Streamlit calls run in bare mode and still serialize their figures)
+on synthetic datasets, and records the wall time, peak RSS and rows/sec of
+each stage. Each dataset size runs in its own process so memory peaks don't
+carry over between sizes.
+
+    python benchmark.py --rows 10000 100000 1000000 --output report.json
+    python benchmark.py --rows 100000 --csv --baseline report.json
+
+With --baseline, stages slower than the baseline by more than --tolerance
+are listed and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+DEFAULT_ROWS = [10 ** 4, 10 ** 5, 10 ** 6]
+
+# Synthetic rows per campaign and day: 3 platforms x 6 tactics x 50 states,
+# of which about 30% have a row
+ROWS_PER_CAMPAIGN_DAY = 3 * 6 * 50 * 0.3
+
+# How often peak RSS is sampled while a stage runs
+RSS_SAMPLE_SECONDS = 0.005
+
+# Slowdowns smaller than this are timer noise, not regressions
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where /proc is missing"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+class PeakRssSampler:
+    """Track the peak RSS reached while a stage runs"""
+
+    def __init__(self):
+        self.peak = current_rss()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self.stopped.wait(RSS_SAMPLE_SECONDS):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        if self.peak is not None:
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.peak is None:
+            # Without /proc only the process-wide high-water mark is known
+            # (kilobytes on Linux, bytes on macOS)
+            scale = 1 if sys.platform == 'darwin' else 1024
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def sample_shape(rows):
+    """Days and campaigns of a synthetic dataset of roughly the given row count"""
+    campaigns = max(1, round(rows / (365 * ROWS_PER_CAMPAIGN_DAY)))
+    days = max(1, round(rows / (ROWS_PER_CAMPAIGN_DAY * campaigns)))
+    return days, campaigns
+
+
+def write_sample_csvs(marketing_df, business_df, data_dir):
+    """Write a synthetic dataset as one CSV per platform plus the business CSV"""
+    for platform_name, rows in marketing_df.groupby('platform', observed=True):
+        rows.drop(columns='platform').to_csv(os.path.join(data_dir, f'{platform_name}.csv'), index=False)
+    business_df.to_csv(os.path.join(data_dir, 'Business.csv'), index=False)
+
+
+def run_benchmark(rows, use_csv=False, seed=42):
+    """Time every stage on a synthetic dataset of about `rows` rows"""
+    # Streamlit logs a warning for each call made outside a running app
+    from streamlit import logger
+    logger.set_log_level('error')
+
+    import pandas as pd
+
+    import analytics
+    import marketing_dashboard as dashboard
+    from data_loader import build_marketing_cube, compact_business_frame, compact_marketing_frame
+    from sample_data import generate_sample_data
+
+    stages = []
+
+    def timed(name, function, *args):
+        with PeakRssSampler() as sampler:
+            start = time.perf_counter()
+            result = function(*args)
+            seconds = time.perf_counter() - start
+        stages.append({
+            'stage': name,
+            'seconds': round(seconds, 6),
+            'peak_rss_mb': round(sampler.peak / 1024 ** 2, 1),
+            'rows_per_sec': round(dataset_rows / seconds) if seconds > 0 else None
+        })
+        return result
+
+    days, campaigns = sample_shape(rows)
+    dataset_rows = rows
+    marketing_df, business_df = timed('generate', generate_sample_data, days, 50, campaigns, seed)
+    dataset_rows = len(marketing_df)
+
+    if use_csv:
+        with tempfile.TemporaryDirectory() as data_dir:
+            write_sample_csvs(marketing_df, business_df, data_dir)
+            del marketing_df, business_df
+
+            # read_and_process_data is the uncached body of load_and_process_data;
+            # the second load reads the columnar cache written by the first
+            previous_dir = os.getcwd()
+            os.chdir(data_dir)
+            try:
+                timed('load_csv_cold', dashboard.read_and_process_data)
+                marketing_df, business_df, marketing_cube = timed('load_csv_warm', dashboard.read_and_process_data)
+            finally:
+                os.chdir(previous_dir)
+    else:
+        def process():
+            marketing = compact_marketing_frame(marketing_df)
+            business = compact_business_frame(business_df)
+            return (
+                marketing.sort_values('date', kind='stable', ignore_index=True),
+                business.sort_values('date', kind='stable', ignore_index=True)
+            )
+
+        marketing_df, business_df = timed('process', process)
+        marketing_cube = timed('cube', build_marketing_cube, marketing_df)
+
+    kpi_prefix_sums = timed('prefix_sums', analytics.build_kpi_prefix_sums, marketing_cube, business_df, marketing_df)
+
+    # The middle half of the dates with every platform and tactic selected,
+    # plus the last 30 days of one platform for partition pruning
+    first_date, last_date = analytics.data_date_bounds(kpi_prefix_sums)
+    span = last_date - first_date
+    selected_date_range = (first_date + span / 4, last_date - span / 4)
+    platforms = list(marketing_cube['platform'].unique())
+    tactics = list(marketing_cube['tactic'].unique())
+
+    filter_spec = timed(
+        'filter_spec', analytics.make_filter_spec, kpi_prefix_sums, selected_date_range, platforms, tactics
+    )
+    pruned_spec = analytics.make_filter_spec(
+        kpi_prefix_sums, (last_date - pd.Timedelta(days=29), last_date), platforms[:1], tactics
+    )
+    timed('select_cells', analytics.select_cells, marketing_cube, filter_spec)
+    timed('select_cells_pruned', analytics.select_cells, marketing_cube, pruned_spec)
+
+    # The analytics engine alone, then each view including its figure
+    timed('compute_kpis', analytics.compute_kpis, kpi_prefix_sums, filter_spec)
+    timed('summarize_platforms', analytics.summarize_platforms, marketing_cube, filter_spec)
+    timed('summarize_tactics', analytics.summarize_tactics, marketing_cube, filter_spec)
+    timed('compute_trend_series', analytics.compute_trend_series, kpi_prefix_sums, filter_spec)
+    timed('compute_trend_series_month', analytics.compute_trend_series, kpi_prefix_sums, filter_spec, 'month')
+    timed('summarize_states', analytics.summarize_states, marketing_cube, filter_spec)
+    timed('generate_insights', analytics.generate_insights, marketing_cube, business_df, filter_spec)
+    timed('rank_campaigns', analytics.rank_campaigns, marketing_df, kpi_prefix_sums, filter_spec, 'roas')
+
+    timed('create_kpi_cards', dashboard.create_kpi_cards, kpi_prefix_sums, filter_spec)
+    timed('create_platform_comparison', dashboard.create_platform_comparison, marketing_cube, filter_spec)
+    timed('create_tactic_analysis', dashboard.create_tactic_analysis, marketing_cube, filter_spec)
+    timed('create_trend_analysis', dashboard.create_trend_analysis, kpi_prefix_sums, filter_spec)
+    timed('create_geographic_analysis', dashboard.create_geographic_analysis, marketing_cube, filter_spec)
+    timed('create_campaign_drilldown', dashboard.create_campaign_drilldown, marketing_df, kpi_prefix_sums, filter_spec)
+
+    # A rerun of the subplot views reuses the figure skeletons built above
+    timed('create_platform_comparison_rerun', dashboard.create_platform_comparison, marketing_cube, filter_spec)
+    timed('create_trend_analysis_rerun', dashboard.create_trend_analysis, kpi_prefix_sums, filter_spec)
+
+    return {
+        'rows': dataset_rows,
+        'cube_rows': len(marketing_cube),
+        'days': days,
+        'campaigns': campaigns,
+        'source': 'csv' if use_csv else 'memory',
+        'stages': stages
+    }
+
+
+def run_in_subprocess(rows, use_csv, seed):
+    """Benchmark one dataset size in a fresh interpreter and return its result"""
+    command = [sys.executable, os.path.abspath(__file__), '--worker', str(rows), '--seed', str(seed)]
+    if use_csv:
+        command.append('--csv')
+    completed = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def find_regressions(report, baseline, tolerance):
+    """Stages slower than the same stage and size in the baseline by more than tolerance"""
+    baseline_seconds = {
+        (run['rows'], run['source'], stage['stage']): stage['seconds']
+        for run in baseline['runs'] for stage in run['stages']
+    }
+    regressions = []
+    for run in report['runs']:
+        for stage in run['stages']:
+            previous = baseline_seconds.get((run['rows'], run['source'], stage['stage']))
+            if (previous and stage['seconds'] > previous * (1 + tolerance)
+                    and stage['seconds'] - previous > MIN_REGRESSION_SECONDS):
+                regressions.append({
+                    'rows': run['rows'],
+                    'stage': stage['stage'],
+                    'seconds': stage['seconds'],
+                    'baseline_seconds': previous
+                })
+    return regressions
+
+
+def print_summary(report):
+    for run in report['runs']:
+        print(f"\n{run['rows']:,} rows ({run['cube_rows']:,} cube cells, {run['source']})")
+        for stage in run['stages']:
+            rate = f"{stage['rows_per_sec']:,}" if stage['rows_per_sec'] else '-'
+            print(f"  {stage['stage']:<28} {stage['seconds']:>10.4f}s {stage['peak_rss_mb']:>10.1f} MB {rate:>16} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help='approximate dataset sizes to benchmark, e.g. 10000 100000000')
+    parser.add_argument('--csv', action='store_true',
+                        help='write each dataset to CSVs and time loading them instead of processing in memory')
+    parser.add_argument('--seed', type=int, default=42, help='seed for the synthetic data')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    parser.add_argument('--baseline', help='JSON report to compare the stage timings against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown against the baseline (default 0.25 = 25%%)')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_benchmark(args.worker, args.csv, args.seed)))
+        return 0
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'runs': [run_in_subprocess(rows, args.csv, args.seed) for rows in args.rows]
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = find_regressions(report, json.load(f), args.tolerance)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print_summary(report)
+    else:
+        print(json.dumps(report, indent=2))
+
+    for regression in report.get('regressions', []):
+        print(
+            f"REGRESSION {regression['stage']} at {regression['rows']:,} rows: "
+            f"{regression['seconds']:.4f}s vs {regression['baseline_seconds']:.4f}s",
+            file=sys.stderr
+        )
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,629 @@
+"""
+Data loading for the Marketing Intelligence Dashboard.
+
+Platform exports are registered through discover_sources: a JSON config
+next to the data, or every CSV beside the business file. Each export is
+parsed into a compact typed frame (categorical dimensions, 32-bit measures)
+and rolled up into its own daily cube of additive measures, and both are
+kept as columnar (Parquet) copies next to the CSVs. Later loads skip CSV
+parsing and aggregation for every source whose file has not changed.
+
+Cube cells are clustered by platform and then date, so each (platform,
+month) partition is one contiguous run of rows; build_partition_index
+records where each run starts and stops so filters can skip the rest.
+
+Processed frames can also be published as a store of per-column .npy files
+that every session and worker process memory-maps read-only, so the page
+cache holds the only copy of the data.
+
+AppendOnlySource remembers how far each CSV has been read so a refresh
+parses only the rows appended since, and iter_csv_chunks streams exports
+too large to hold in memory in chunks sized to a memory budget, which
+CubeAccumulator folds into the cube.
+run_parallel loads independent sources concurrently.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+import glob
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Directory created next to the CSVs that holds the columnar copies
+CACHE_DIR_NAME = '.dashboard_cache'
+
+# Bump whenever the parsed schema changes so older cache files are ignored
+CACHE_VERSION = 6
+
+# Optional registry of sources kept in the data directory, e.g.
+# {"business": "Business.csv", "platforms": {"Snap": "exports/snap.csv"}}
+SOURCES_CONFIG_NAME = 'sources.json'
+
+# Business file recognised when discovering sources in a directory
+BUSINESS_FILE_NAME = 'business.csv'
+
+# Rows parsed first when streaming, to measure what a parsed row costs
+PROBE_ROWS = 1000
+
+# Memory-mapped stores of other data versions are removed only once they
+# are this old, so processes still opening one (e.g. during a source
+# update or a rolling deploy) find it in place
+STALE_STORE_SECONDS = 3600
+
+# Repeated string columns stored as categoricals
+MARKETING_CATEGORIES = ['platform', 'tactic', 'state', 'campaign']
+
+# Label of a blank dimension value; rows keep counting in every total
+# instead of dropping out of the groupbys
+UNKNOWN_LABEL = 'Unknown'
+
+# Dimensions the daily cube is keyed by and the additive measures it holds;
+# ratios are derived from these sums when read (see metrics.py)
+CUBE_DIMENSIONS = ['date', 'platform', 'tactic', 'state']
+CUBE_MEASURES = ['spend', 'attributed_revenue', 'impressions', 'clicks', 'rows']
+
+# Order of the cube's cells: platform-major, so every (platform, month)
+# partition is contiguous and date-sorted
+CUBE_ORDER = ['platform', 'date', 'tactic', 'state']
+
+# Measure widths: counts fit int32 and money keeps enough precision in
+# float32; aggregations widen back to 64 bits before summing
+MARKETING_DTYPES = {
+    'impressions': 'int32',
+    'clicks': 'int32',
+    'spend': 'float32',
+    'attributed_revenue': 'float32'
+}
+BUSINESS_DTYPES = {
+    'orders': 'int32',
+    'new_orders': 'int32',
+    'new_customers': 'int32',
+    'total_revenue': 'float32',
+    'gross_profit': 'float32',
+    'cogs': 'float32'
+}
+
+
+def compact_marketing_frame(marketing_df):
+    """Store dimensions as categoricals and metrics in their narrow dtypes"""
+    for column in MARKETING_CATEGORIES:
+        marketing_df[column] = marketing_df[column].astype('category')
+    return marketing_df.astype(MARKETING_DTYPES)
+
+
+def compact_business_frame(business_df):
+    """Store business metrics in their narrow dtypes"""
+    return business_df.astype(BUSINESS_DTYPES)
+
+
+def concat_frames(frames):
+    """Concatenate frames while keeping their categorical columns categorical"""
+    # pandas falls back to object dtype unless every frame shares the same
+    # categories, so align them on the union first
+    for column in frames[0].columns:
+        dtype = frames[0][column].dtype
+        if not isinstance(dtype, pd.CategoricalDtype) or all(df[column].dtype == dtype for df in frames[1:]):
+            continue
+        categories = union_categoricals([df[column] for df in frames], sort_categories=True).categories
+        frames = [
+            df.assign(**{column: df[column].cat.set_categories(categories)})
+            for df in frames
+        ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def memory_report(frames):
+    """Summarize rows and in-memory size of named frames"""
+    return pd.DataFrame([
+        {
+            'frame': name,
+            'rows': len(df),
+            'memory_mb': round(df.memory_usage(index=True, deep=True).sum() / 1024 ** 2, 2)
+        }
+        for name, df in frames.items()
+    ]).set_index('frame')
+
+
+@dataclass(frozen=True)
+class PlatformSource:
+    """A platform export; its rows are tagged with the platform name when loaded"""
+    platform: str
+    path: str
+
+
+@dataclass(frozen=True)
+class DataSources:
+    """The registered platform exports and the business file"""
+    platforms: tuple
+    business_path: str
+
+    @property
+    def paths(self):
+        return [source.path for source in self.platforms] + [self.business_path]
+
+    def fingerprint(self):
+        """Changes whenever a source is added, removed, moved or modified"""
+        return tuple((path, file_fingerprint(path)) for path in self.paths)
+
+
+def discover_sources(data_dir, config_path=None):
+    """Register the platform exports and business file of a data directory
+
+    A JSON config (SOURCES_CONFIG_NAME, or config_path) lists the sources
+    explicitly. Without one, every CSV in the directory other than the
+    business file is a platform named after its file, so a new channel is
+    added by dropping its export next to the others. Returns None when the
+    sources are incomplete.
+    """
+    config_path = config_path or os.path.join(data_dir, SOURCES_CONFIG_NAME)
+
+    if os.path.isfile(config_path):
+        with open(config_path) as f:
+            config = json.load(f)
+        base_dir = os.path.dirname(config_path)
+        platforms = [
+            PlatformSource(platform, os.path.join(base_dir, path))
+            for platform, path in config.get('platforms', {}).items()
+        ]
+        business_path = os.path.join(base_dir, config.get('business', 'Business.csv'))
+    else:
+        csv_files = sorted(glob.glob(os.path.join(glob.escape(data_dir), '*.csv')))
+        business_files = [path for path in csv_files if os.path.basename(path).lower() == BUSINESS_FILE_NAME]
+        if not business_files:
+            return None
+        business_path = business_files[0]
+        platforms = [
+            PlatformSource(os.path.splitext(os.path.basename(path))[0], path)
+            for path in csv_files if path != business_path
+        ]
+
+    sources = DataSources(tuple(sorted(platforms, key=lambda source: source.platform)), business_path)
+    if not platforms or not all(os.path.isfile(path) for path in sources.paths):
+        return None
+    return sources
+
+
+def resolve_sources(data_dirs, config_path=None):
+    """Return the sources of the first data directory that has a complete set"""
+    for data_dir in data_dirs:
+        sources = discover_sources(data_dir, config_path)
+        if sources is not None:
+            return sources
+    return None
+
+
+def process_marketing_rows(marketing_df, platform):
+    """Type raw platform rows, labelling blank dimensions as Unknown"""
+    marketing_df['date'] = pd.to_datetime(marketing_df['date'])
+    marketing_df['platform'] = platform
+    for column in MARKETING_CATEGORIES:
+        marketing_df[column] = marketing_df[column].fillna(UNKNOWN_LABEL)
+    return compact_marketing_frame(marketing_df)
+
+
+def process_business_rows(business_df):
+    """Type raw business rows"""
+    business_df['date'] = pd.to_datetime(business_df['date'])
+    return compact_business_frame(business_df)
+
+
+def parse_marketing_csv(path, platform):
+    """Parse one platform export into a typed frame"""
+    return process_marketing_rows(pd.read_csv(path), platform)
+
+
+def parse_business_csv(path):
+    """Parse the business export into a typed frame"""
+    return process_business_rows(pd.read_csv(path))
+
+
+def file_fingerprint(path):
+    """Identify a file's current contents by its size and modification time"""
+    stat = os.stat(path)
+    return f'{stat.st_size}-{stat.st_mtime_ns}'
+
+
+def cache_file_stem(path):
+    """Cache path of a source file without its version and fingerprint suffix"""
+    directory, filename = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, CACHE_DIR_NAME, os.path.splitext(filename)[0])
+
+
+def write_cache_file(df, cache_stem, current_prefix, cache_file):
+    """Atomically write a columnar cache file and drop those of older file versions"""
+    temp_file = f'{cache_file}.{os.getpid()}.tmp'
+
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        df.to_parquet(temp_file, index=False)
+        os.replace(temp_file, cache_file)
+
+        for stale_file in glob.glob(f'{glob.escape(cache_stem)}.v*.parquet'):
+            if not stale_file.startswith(current_prefix):
+                os.remove(stale_file)
+    except (OSError, ImportError):
+        # A read-only mount or missing Parquet engine only costs the cache
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def read_with_cache(path, parse, kind='rows'):
+    """Read a frame derived from a source through the columnar cache
+
+    parse(path) builds the frame when the source changed since it was cached;
+    kind tells apart the frames cached for the same source.
+    """
+    # Raises FileNotFoundError for a missing source, which callers rely on
+    fingerprint = file_fingerprint(path)
+    cache_stem = cache_file_stem(path)
+    cache_file = f'{cache_stem}.v{CACHE_VERSION}.{fingerprint}.{kind}.parquet'
+
+    if os.path.exists(cache_file):
+        try:
+            return pd.read_parquet(cache_file)
+        except Exception:
+            # Unreadable (e.g. truncated) cache files are rebuilt below
+            pass
+
+    df = parse(path)
+    write_cache_file(df, cache_stem, f'{cache_stem}.v{CACHE_VERSION}.{fingerprint}.', cache_file)
+    return df
+
+
+def iter_csv_chunks(path, chunk_bytes, progress=None):
+    """Yield a CSV as raw row chunks whose parsed size stays near chunk_bytes
+
+    progress, if given, is called after each chunk with the bytes read so
+    far and the file size.
+    """
+    total_bytes = os.path.getsize(path)
+
+    with open(path, 'rb') as f:
+        reader = pd.read_csv(f, iterator=True)
+        chunk_rows = PROBE_ROWS
+
+        while True:
+            try:
+                chunk = reader.get_chunk(chunk_rows)
+            except StopIteration:
+                break
+
+            # Size the following chunks from the measured cost of a parsed row
+            row_bytes = chunk.memory_usage(index=True, deep=True).sum() / max(len(chunk), 1)
+            chunk_rows = max(int(chunk_bytes // row_bytes), 1)
+
+            if progress is not None:
+                progress(min(f.tell(), total_bytes), total_bytes)
+            yield chunk
+
+
+def run_parallel(tasks, workers, pool='thread'):
+    """Run (function, *args) tasks on a thread or process pool, returning results in order"""
+    if workers <= 1 or len(tasks) <= 1:
+        return [function(*args) for function, *args in tasks]
+
+    # Processes sidestep the GIL for the Python-level parts of parsing, at
+    # the cost of pickling each parsed frame back to this process
+    executor_class = ProcessPoolExecutor if pool == 'process' else ThreadPoolExecutor
+    with executor_class(max_workers=min(workers, len(tasks))) as executor:
+        futures = [executor.submit(function, *args) for function, *args in tasks]
+        return [future.result() for future in futures]
+
+
+def mmap_store_dir(paths, base_dir=None):
+    """Directory of the memory-mapped store built from the given source files"""
+    # Any change to a source's path, size or mtime yields a new store
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(f'{os.path.abspath(path)}:{file_fingerprint(path)};'.encode())
+
+    if base_dir is None:
+        base_dir = os.path.join(os.path.dirname(os.path.abspath(paths[0])), CACHE_DIR_NAME)
+    return os.path.join(base_dir, f'mmap-v{CACHE_VERSION}-{digest.hexdigest()[:16]}')
+
+
+def write_mmap_store(frames, store_dir):
+    """Write named frames as one .npy file per column plus a JSON manifest"""
+    temp_dir = f'{store_dir}.{os.getpid()}.tmp'
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    manifest = {}
+
+    for name, df in frames.items():
+        os.makedirs(os.path.join(temp_dir, name))
+        columns = []
+
+        for i, column in enumerate(df.columns):
+            values = df[column]
+            entry = {'name': column, 'file': f'{i}.npy'}
+
+            # Strings are stored as integer codes plus their categories
+            if not (pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_dtype(values)):
+                values = values.astype('category')
+                entry['categories'] = values.cat.categories.tolist()
+                values = values.cat.codes
+
+            np.save(os.path.join(temp_dir, name, entry['file']), values.to_numpy())
+            columns.append(entry)
+
+        manifest[name] = columns
+
+    with open(os.path.join(temp_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    # Publish atomically; if another process got there first, keep theirs
+    try:
+        os.rename(temp_dir, store_dir)
+    except OSError:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        if not os.path.isdir(store_dir):
+            raise
+
+    # Older stores may still be mapped elsewhere, which unlinking leaves
+    # intact, but a process between checking for a store and opening it
+    # needs the files, so only stores past the age threshold go
+    stale_before = time.time() - STALE_STORE_SECONDS
+    stale_pattern = os.path.join(glob.escape(os.path.dirname(store_dir)), 'mmap-v*')
+    for stale_dir in glob.glob(stale_pattern):
+        if stale_dir == store_dir or stale_dir.endswith('.tmp'):
+            continue
+        try:
+            if os.path.getmtime(stale_dir) < stale_before:
+                shutil.rmtree(stale_dir, ignore_errors=True)
+        except OSError:
+            # Already removed by another process
+            pass
+
+
+def open_mmap_store(store_dir):
+    """Open a store's frames as zero-copy views over read-only memory maps"""
+    with open(os.path.join(store_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+
+    frames = {}
+    for name, columns in manifest.items():
+        data = {}
+        for entry in columns:
+            path = os.path.join(store_dir, name, entry['file'])
+            try:
+                values = np.load(path, mmap_mode='r')
+            except ValueError:
+                # Zero-length columns cannot be mapped
+                values = np.load(path)
+
+            if 'categories' in entry:
+                values = pd.Categorical.from_codes(
+                    values, dtype=pd.CategoricalDtype(entry['categories']), validate=False
+                )
+            data[entry['name']] = values
+
+        # copy=False keeps one block per column, backed by the map itself
+        frames[name] = pd.DataFrame(data, copy=False)
+
+    return frames
+
+
+def build_marketing_cube(marketing_df):
+    """Roll raw marketing rows up to one row per (platform, date, tactic, state), in that order"""
+    # Measures are widened so the compact 32-bit row values don't lose
+    # precision when summed, and the categorical dimensions group on their
+    # integer codes
+    cube = marketing_df.assign(
+        spend=marketing_df['spend'].astype('float64'),
+        attributed_revenue=marketing_df['attributed_revenue'].astype('float64'),
+        impressions=marketing_df['impressions'].astype('int64'),
+        clicks=marketing_df['clicks'].astype('int64'),
+        rows=1
+    ).groupby(CUBE_ORDER, sort=True, observed=True)[CUBE_MEASURES].sum()
+
+    return cube.reset_index()
+
+
+def cluster_marketing_cube(marketing_cube):
+    """Group a cube's cells by platform, keeping each platform's cells in their current order"""
+    # A stable sort on the small platform codes is a linear radix sort
+    codes = pd.factorize(marketing_cube['platform'])[0]
+    order = np.argsort(codes, kind='stable')
+    return marketing_cube.take(order).reset_index(drop=True)
+
+
+def merge_marketing_cubes(marketing_cube, new_cube):
+    """Fold a cube of newer rows into the cube, re-aggregating only the platform-days they touch"""
+    # A platform's cells before its first new date are final and later ones
+    # are merged; platforms absent from the new cells are untouched
+    first_new_dates = new_cube.groupby('platform', observed=True)['date'].min()
+    platforms = marketing_cube['platform'].astype('category')
+    cutoffs = first_new_dates.reindex(platforms.cat.categories).to_numpy()[platforms.cat.codes.to_numpy()]
+    is_open = marketing_cube['date'].to_numpy() >= cutoffs
+
+    if is_open.any():
+        merged = concat_frames([marketing_cube[is_open], new_cube])
+        new_cube = merged.groupby(CUBE_ORDER, sort=True, observed=True)[CUBE_MEASURES].sum().reset_index()
+
+    return cluster_marketing_cube(concat_frames([marketing_cube[~is_open], new_cube]))
+
+
+class CubeAccumulator:
+    """Daily cube built chunk by chunk, each merge touching only the cells a chunk can change
+
+    Per platform, the cells dated before the earliest date of the latest
+    chunk are final and kept as a list of date-ordered blocks; only the
+    open tail is re-aggregated with each chunk. The blocks are concatenated
+    once, by cube(), so a merge costs the tail and the chunk rather than
+    the whole running cube.
+    """
+
+    def __init__(self):
+        self.blocks = {}
+        self.tails = {}
+
+    def add(self, chunk_cube):
+        """Fold the cube of one chunk of raw rows in"""
+        for platform, new_cells in chunk_cube.groupby('platform', observed=True, sort=False):
+            blocks = self.blocks.setdefault(platform, [])
+            tail = self.tails.get(platform)
+            if tail is None:
+                self.tails[platform] = new_cells
+                continue
+
+            # Rows dated before the open tail (an export that isn't date
+            # sorted) reopen the final blocks they fall into
+            cutoff = new_cells['date'].min()
+            while blocks and blocks[-1]['date'].iloc[-1] >= cutoff:
+                tail = concat_frames([blocks.pop(), tail])
+
+            is_open = tail['date'].to_numpy() >= cutoff
+            if not is_open.all():
+                blocks.append(tail[~is_open])
+
+            # Only cells on dates both hold are aggregated again; later new
+            # cells follow them unchanged
+            is_shared = new_cells['date'].to_numpy() <= tail['date'].iloc[-1]
+            merged = concat_frames([tail[is_open], new_cells[is_shared]])
+            merged = merged.groupby(CUBE_ORDER, sort=True, observed=True)[CUBE_MEASURES].sum().reset_index()
+            self.tails[platform] = concat_frames([merged, new_cells[~is_shared]])
+
+    def cube(self):
+        """The accumulated cube, clustered by platform in the order they arrived"""
+        parts = [
+            part
+            for platform, tail in self.tails.items()
+            for part in self.blocks[platform] + [tail]
+        ]
+        if not parts:
+            return pd.DataFrame(columns=CUBE_ORDER + CUBE_MEASURES)
+        return concat_frames(parts)
+
+
+def build_partition_index(marketing_cube):
+    """Row ranges of the (platform, month) partitions of a clustered cube
+
+    Returns one row per partition with its platform, month (as the first
+    day of the month) and the [start, stop) offsets of its cells.
+    """
+    platform_codes, platform_labels = pd.factorize(marketing_cube['platform'])
+    months = marketing_cube['date'].to_numpy().astype('datetime64[M]')
+
+    # A partition starts wherever the platform or the month changes
+    starts = np.flatnonzero(np.concatenate([
+        np.ones(min(len(months), 1), dtype=bool),
+        (platform_codes[1:] != platform_codes[:-1]) | (months[1:] != months[:-1])
+    ]))
+    stops = np.append(starts[1:], len(months))
+
+    return pd.DataFrame({
+        'platform': np.asarray(platform_labels, dtype=object)[platform_codes[starts]],
+        'month': months[starts].astype('datetime64[ns]'),
+        'start': starts,
+        'stop': stops
+    })
+
+
+def load_platform_source(source):
+    """Load a platform export and its daily cube, each through the columnar cache"""
+    marketing_df = load_marketing_source(source.path, source.platform)
+    marketing_cube = read_with_cache(source.path, lambda _: build_marketing_cube(marketing_df), 'cube')
+    return marketing_df, marketing_cube
+
+
+def load_marketing_source(path, platform):
+    """Load one platform export, from the columnar cache when it is current"""
+    return read_with_cache(path, lambda source: parse_marketing_csv(source, platform))
+
+
+def load_business_source(path):
+    """Load the business export, from the columnar cache when it is current"""
+    return read_with_cache(path, parse_business_csv)
+
+
+class AppendOnlySource:
+    """A CSV that only grows at the end, read incrementally from a remembered offset"""
+
+    # Bytes just before the offset that must still match for the file to
+    # count as appended to rather than rewritten
+    SIGNATURE_BYTES = 64
+
+    def __init__(self, path, process_rows, load_cached=None):
+        self.path = path
+        self.process_rows = process_rows
+        self.load_cached = load_cached
+        self.reset()
+
+    def reset(self):
+        """Forget progress so the next read starts from the top of the file"""
+        self.columns = None
+        self.offset = 0
+        self.signature = b''
+
+    def read_rows(self):
+        """Return (rows, rewritten) for the rows added since the previous read
+
+        rows is None when nothing complete was appended. rewritten is True
+        when the file no longer starts with what was read before; progress
+        is then reset and rows holds the whole file.
+        """
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            rewritten = self.offset > 0 and not self._continues_previous_read(f, size)
+            if rewritten:
+                self.reset()
+
+            if self.offset == 0 and self.load_cached is not None and self._ends_with_newline(f, size):
+                # A complete file can come from the columnar cache in one go,
+                # unless it grew while loading: the cache then holds rows past
+                # `size`, so the first `size` bytes are read below instead
+                header = f.readline()
+                rows = self.load_cached(self.path)
+                if os.stat(self.path).st_size == size:
+                    self._advance(list(pd.read_csv(io.BytesIO(header), nrows=0).columns), f, size)
+                    return rows, rewritten
+
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+
+        # A partially written last line is left for the next read
+        data = data[:data.rfind(b'\n') + 1]
+        if not data:
+            return None, rewritten
+
+        if self.columns is None:
+            raw_rows = pd.read_csv(io.BytesIO(data))
+        else:
+            raw_rows = pd.read_csv(io.BytesIO(data), header=None, names=self.columns)
+
+        self.columns = list(raw_rows.columns)
+        self.offset += len(data)
+        self.signature = (self.signature + data)[-self.SIGNATURE_BYTES:]
+
+        if raw_rows.empty:
+            return None, rewritten
+        return self.process_rows(raw_rows), rewritten
+
+    def _advance(self, columns, f, size):
+        """Mark the file as read up to `size`"""
+        self.columns = columns
+        self.offset = size
+        f.seek(max(size - self.SIGNATURE_BYTES, 0))
+        self.signature = f.read(self.SIGNATURE_BYTES)
+
+    def _continues_previous_read(self, f, size):
+        """Check the bytes before the offset are still the ones read last time"""
+        if size < self.offset:
+            return False
+        f.seek(self.offset - len(self.signature))
+        return f.read(len(self.signature)) == self.signature
+
+    @staticmethod
+    def _ends_with_newline(f, size):
+        if size == 0:
+            return False
+        f.seek(size - 1)
+        ends_with_newline = f.read(1) == b'\n'
+        f.seek(0)
+        return ends_with_newline
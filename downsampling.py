@@ -0,0 +1,66 @@
+"""
+Point reduction for long chart series.
+
+A chart a few hundred pixels wide cannot show more than a few hundred
+distinct points per series, yet every point is serialized into the figure
+JSON and drawn by the browser. lttb_indices picks which points to keep with
+Largest-Triangle-Three-Buckets, which holds on to the peaks and troughs that
+give a line its shape; min_max_indices keeps each bucket's extremes exactly.
+"""
+import numpy as np
+
+
+def as_float(values):
+    """Values as float64, with datetimes as their nanosecond timestamps"""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype('datetime64[ns]').astype('int64')
+    return values.astype('float64')
+
+
+def lttb_indices(x, y, budget):
+    """Indices of at most `budget` points of an x-sorted series, chosen by LTTB
+
+    The first and last points are always kept; the others are split into
+    budget - 2 equal buckets and from each the point forming the largest
+    triangle with the previously kept point and the next bucket's average
+    is kept.
+    """
+    num_points = len(x)
+    if budget >= num_points or budget < 3:
+        return np.arange(num_points)
+
+    x = as_float(x)
+    y = as_float(y)
+    edges = np.linspace(1, num_points - 1, budget - 1).astype('int64')
+
+    keep = np.empty(budget, dtype='int64')
+    keep[0], keep[-1] = 0, num_points - 1
+    previous = 0
+    for bucket in range(budget - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else num_points
+        next_x = x[stop:next_stop].mean()
+        next_y = y[stop:next_stop].mean()
+
+        # Twice the triangle areas; only their order matters
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        keep[bucket + 1] = previous
+    return keep
+
+
+def min_max_indices(y, budget):
+    """Indices of the lowest and highest point of each of budget // 2 equal buckets, in order"""
+    num_points = len(y)
+    if budget >= num_points or budget < 2:
+        return np.arange(num_points)
+
+    y = as_float(y)
+    edges = np.linspace(0, num_points, budget // 2 + 1).astype('int64')
+    lows = np.array([start + np.argmin(y[start:stop]) for start, stop in zip(edges[:-1], edges[1:])])
+    highs = np.array([start + np.argmax(y[start:stop]) for start, stop in zip(edges[:-1], edges[1:])])
+    return np.unique(np.concatenate([lows, highs]))
@@ -0,0 +1,134 @@
+"""
+Opt-in stage timings for dashboard reruns.
+
+main() opens a recorder for each rerun with begin_rerun; the views then mark
+the end of each stage with a lap, which costs nothing when no recorder is
+active (e.g. when the views run from the benchmark). finish_rerun logs the
+rerun as one structured JSON record and adds it to process-wide totals that
+prometheus_text renders in the Prometheus text exposition format.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('dashboard.instrumentation')
+
+# Recorder of the rerun running on this thread; Streamlit runs each
+# session's script on its own thread
+_current = threading.local()
+
+# Totals per (view, stage) across every rerun in this process
+_totals_lock = threading.Lock()
+_stage_totals = {}
+_rerun_totals = {'count': 0, 'seconds': 0.0}
+
+
+class StageTimer:
+    """Times consecutive stages of one view; each lap ends the running stage"""
+
+    def __init__(self, recorder, view):
+        self.recorder = recorder
+        self.view = view
+        self.started = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.recorder.timings.append({'view': self.view, 'stage': stage, 'seconds': now - self.started})
+        self.started = now
+
+
+class NullStageTimer:
+    """Stand-in used when no rerun is being instrumented"""
+
+    def lap(self, stage):
+        pass
+
+
+NULL_TIMER = NullStageTimer()
+
+
+class RerunRecorder:
+    """Stage timings of one rerun"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = []
+
+
+def enable_logging():
+    """Send the rerun records to stderr at INFO level"""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def begin_rerun(enabled=True):
+    """Start recording the stages of this rerun when enabled"""
+    _current.recorder = RerunRecorder() if enabled else None
+
+
+def start_stages(view):
+    """A timer whose laps record the stages of a view in the current rerun"""
+    recorder = getattr(_current, 'recorder', None)
+    return StageTimer(recorder, view) if recorder is not None else NULL_TIMER
+
+
+def finish_rerun():
+    """Stop recording, export the rerun and return its timings (None when disabled)"""
+    recorder = getattr(_current, 'recorder', None)
+    _current.recorder = None
+    if recorder is None:
+        return None
+
+    total_seconds = time.perf_counter() - recorder.started
+    with _totals_lock:
+        for timing in recorder.timings:
+            totals = _stage_totals.setdefault((timing['view'], timing['stage']), {'count': 0, 'seconds': 0.0})
+            totals['count'] += 1
+            totals['seconds'] += timing['seconds']
+        _rerun_totals['count'] += 1
+        _rerun_totals['seconds'] += total_seconds
+
+    logger.info(json.dumps({
+        'event': 'dashboard_rerun',
+        'total_seconds': round(total_seconds, 6),
+        'stages': [dict(timing, seconds=round(timing['seconds'], 6)) for timing in recorder.timings]
+    }))
+    return {'total_seconds': total_seconds, 'stages': recorder.timings}
+
+
+def prometheus_text():
+    """Stage timings of every rerun so far in the Prometheus text format"""
+    lines = [
+        '# HELP dashboard_stage_seconds Time spent in each dashboard stage.',
+        '# TYPE dashboard_stage_seconds summary'
+    ]
+    with _totals_lock:
+        for (view, stage), totals in sorted(_stage_totals.items()):
+            labels = f'view="{view}",stage="{stage}"'
+            lines.append(f'dashboard_stage_seconds_sum{{{labels}}} {totals["seconds"]:.6f}')
+            lines.append(f'dashboard_stage_seconds_count{{{labels}}} {totals["count"]}')
+        lines += [
+            '# HELP dashboard_rerun_seconds Time spent in whole dashboard reruns.',
+            '# TYPE dashboard_rerun_seconds summary',
+            f'dashboard_rerun_seconds_sum {_rerun_totals["seconds"]:.6f}',
+            f'dashboard_rerun_seconds_count {_rerun_totals["count"]}'
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus_file(path, text=None):
+    """Atomically write metrics text (prometheus_text by default) to a file, e.g. for node_exporter's textfile collector"""
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write(text if text is not None else prometheus_text())
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.warning('Could not write metrics to %s', path, exc_info=True)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -3,10 +3,51 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import numpy as np
-from datetime import datetime, timedelta
 import warnings
 import os
+import threading
+import time
+from data_loader import (
+    AppendOnlySource,
+    CubeAccumulator,
+    build_marketing_cube,
+    compact_business_frame,
+    compact_marketing_frame,
+    concat_frames,
+    iter_csv_chunks,
+    load_business_source,
+    load_marketing_source,
+    load_platform_source,
+    memory_report,
+    merge_marketing_cubes,
+    mmap_store_dir,
+    open_mmap_store,
+    process_business_rows,
+    process_marketing_rows,
+    resolve_sources,
+    run_parallel,
+    write_mmap_store
+)
+from analytics import (
+    STATUS_NO_DATA,
+    STATUS_OK,
+    build_kpi_prefix_sums,
+    choose_grain,
+    compute_kpis,
+    compute_trend_series,
+    data_date_bounds,
+    extend_campaign_index,
+    generate_insights,
+    make_filter_spec,
+    rank_campaigns,
+    summarize_platforms,
+    summarize_states,
+    summarize_tactics
+)
+from downsampling import lttb_indices, min_max_indices
+from instrumentation import begin_rerun, enable_logging, finish_rerun, prometheus_text, start_stages, write_prometheus_file
+from result_cache import LRUResultCache
+from sample_data import generate_sample_data
 warnings.filterwarnings('ignore')
 
 # Disable file watcher to avoid inotify issues on Streamlit Cloud
@@ -166,177 +207,426 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def generate_sample_data():
-    """Generate sample data for demonstration"""
-    np.random.seed(42)
-    
-    # Generate 120 days of data
-    start_date = datetime(2024, 1, 1)
-    dates = [start_date + timedelta(days=i) for i in range(120)]
-    
-    # Campaign tactics and states
-    tactics = ['Search', 'Display', 'Video', 'Shopping', 'Discovery', 'App Install']
-    states = ['CA', 'NY', 'TX', 'FL', 'IL', 'PA', 'OH', 'GA', 'NC', 'MI']
-    platforms = ['Facebook', 'Google', 'TikTok']
-    
-    # Generate marketing data
-    marketing_data = []
-    for date in dates:
-        for platform in platforms:
-            for tactic in tactics:
-                for state in states:
-                    if np.random.random() < 0.3:  # 30% chance of having data
-                        impressions = np.random.randint(1000, 50000)
-                        clicks = np.random.randint(10, 500)
-                        spend = np.random.uniform(50, 2000)
-                        revenue = spend * np.random.uniform(2, 8)
-                        
-                        marketing_data.append({
-                            'date': date,
-                            'platform': platform,
-                            'tactic': tactic,
-                            'state': state,
-                            'campaign': f'{platform}_{tactic}_{state}',
-                            'impressions': impressions,
-                            'clicks': clicks,
-                            'spend': round(spend, 2),
-                            'attributed_revenue': round(revenue, 2)
-                        })
-    
-    # Generate business data
-    business_data = []
-    for date in dates:
-        orders = np.random.randint(50, 200)
-        new_orders = int(orders * np.random.uniform(0.6, 0.9))
-        new_customers = int(new_orders * np.random.uniform(0.7, 0.95))
-        total_revenue = np.random.uniform(10000, 50000)
-        gross_profit = total_revenue * np.random.uniform(0.3, 0.5)
-        cogs = total_revenue - gross_profit
-        
-        business_data.append({
-            'date': date,
-            'orders': int(orders),
-            'new_orders': int(new_orders),
-            'new_customers': int(new_customers),
-            'total_revenue': round(total_revenue, 2),
-            'gross_profit': round(gross_profit, 2),
-            'cogs': round(cogs, 2)
-        })
-    
-    return pd.DataFrame(marketing_data), pd.DataFrame(business_data)
+# Directories searched for the data, for local vs cloud deployment; the
+# first one holding a business file and at least one platform export wins
+DATA_DIR_CANDIDATES = [
+    # Local development and cloud deployment paths (same directory)
+    '.',
+    # Streamlit Cloud specific paths
+    '/mount/src/marketing-intelligence-dashboard',
+    # Alternative Streamlit Cloud paths
+    '/app/marketing-intelligence-dashboard'
+]
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour to reduce file system access
-def load_and_process_data():
-    """Load and process all datasets"""
+# Optional JSON file listing the platform exports and business file; without
+# it every CSV next to the business file is a platform named after the file
+SOURCES_CONFIG = os.environ.get('DASHBOARD_SOURCES_CONFIG')
+
+# 'memory' keeps a per-session copy of the data via st.cache_data; 'mmap'
+# writes the processed columns to memory-mapped files once and shares one
+# read-only copy across sessions and worker processes; 'incremental' keeps
+# one copy per process and ingests only rows appended to the CSVs;
+# 'streaming' folds the platform CSVs into the cube chunk by chunk and
+# keeps no raw rows, for exports too large to load whole
+LOADER_MODE = os.environ.get('DASHBOARD_LOADER_MODE', 'memory')
+
+# Pool used to parse the CSVs concurrently: 'thread' or 'process', with
+# DASHBOARD_LOADER_WORKERS workers (1 loads the files one after another)
+LOADER_POOL = os.environ.get('DASHBOARD_LOADER_POOL', 'thread')
+LOADER_WORKERS = int(os.environ.get('DASHBOARD_LOADER_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Approximate peak memory for the chunks in flight when loading in
+# streaming mode, on top of the cube being built
+CHUNK_BUDGET_MB = float(os.environ.get('DASHBOARD_CHUNK_BUDGET_MB', '256'))
+
+# How often the incremental loader checks the CSVs for appended rows
+REFRESH_SECONDS = float(os.environ.get('DASHBOARD_REFRESH_SECONDS', '60'))
+
+# Optional location for the memory-mapped files (e.g. /dev/shm); defaults
+# to the cache directory next to the CSVs
+MMAP_DIR = os.environ.get('DASHBOARD_MMAP_DIR')
+
+# Size of the sample dataset used when no CSVs are found; raise these to
+# load-test the dashboard with synthetic data
+SAMPLE_DAYS = int(os.environ.get('DASHBOARD_SAMPLE_DAYS', '120'))
+SAMPLE_STATES = int(os.environ.get('DASHBOARD_SAMPLE_STATES', '10'))
+SAMPLE_CAMPAIGNS = int(os.environ.get('DASHBOARD_SAMPLE_CAMPAIGNS', '1'))
+SAMPLE_SEED = int(os.environ.get('DASHBOARD_SAMPLE_SEED', '42'))
+
+# Opt-in stage timings per rerun: shown in a sidebar diagnostics panel and
+# logged as JSON records; DASHBOARD_METRICS_FILE also receives them in the
+# Prometheus text format (e.g. for node_exporter's textfile collector)
+INSTRUMENTATION = os.environ.get('DASHBOARD_INSTRUMENTATION', '0') == '1'
+METRICS_FILE = os.environ.get('DASHBOARD_METRICS_FILE')
+
+if INSTRUMENTATION:
+    enable_logging()
+
+# 'lazy' (default) computes and draws only the open tab, rerunning when
+# another tab is selected; 'eager' renders every tab on each rerun so
+# switching tabs is instant
+LAZY_TABS = os.environ.get('DASHBOARD_TAB_MODE', 'lazy') == 'lazy'
+DASHBOARD_TABS = ["📊 Performance", "🎯 Tactics", "📈 Trends", "🗺️ Geography", "🔎 Campaigns", "💡 Insights"]
+
+# Computed views kept in memory for all sessions of this process, keyed by
+# the dataset version and the normalized filters; 0 disables the cache
+VIEW_CACHE_SIZE = int(os.environ.get('DASHBOARD_VIEW_CACHE_SIZE', '64'))
+
+# Most points drawn per trend series, about one per pixel of a half-width
+# chart; longer ranges are reduced with 'lttb' (default) or 'minmax', and
+# 0 draws every point. Traces still above the WebGL threshold use Scattergl
+TREND_POINT_BUDGET = int(os.environ.get('DASHBOARD_TREND_POINTS', '500'))
+TREND_DOWNSAMPLING = os.environ.get('DASHBOARD_TREND_DOWNSAMPLING', 'lttb')
+WEBGL_POINT_THRESHOLD = 1000
+
+# Sidebar choices of the trend time grain; 'Auto' follows the range length
+TREND_GRAIN_OPTIONS = ['Auto', 'Day', 'Week', 'Month', 'Quarter']
+TREND_GRAIN_TITLES = {'day': 'Daily', 'week': 'Weekly', 'month': 'Monthly', 'quarter': 'Quarterly'}
+
+# Metrics the campaign drill-down ranks by, with their axis titles and bar labels
+CAMPAIGN_RANK_METRICS = {
+    'Spend': ('spend', 'Spend ($)', '${:,.0f}'),
+    'Revenue': ('attributed_revenue', 'Attributed Revenue ($)', '${:,.0f}'),
+    'ROAS': ('roas', 'ROAS', '{:.2f}x')
+}
+
+def find_data_sources():
+    """The registered data sources, or None when no complete set is found"""
+    return resolve_sources(DATA_DIR_CANDIDATES, SOURCES_CONFIG)
+
+def read_and_process_data():
+    """Load all datasets and build the date-sorted frames and daily cube"""
+    marketing_cube = None
+    
     try:
-        # Try different file paths for local vs cloud deployment
-        file_paths = [
-            # Local development paths
-            ('Facebook.csv', 'Google.csv', 'TikTok.csv', 'Business.csv'),
-            # Cloud deployment paths (same directory)
-            ('./Facebook.csv', './Google.csv', './TikTok.csv', './Business.csv'),
-            # Streamlit Cloud specific paths
-            ('/mount/src/marketing-intelligence-dashboard/Facebook.csv', 
-             '/mount/src/marketing-intelligence-dashboard/Google.csv',
-             '/mount/src/marketing-intelligence-dashboard/TikTok.csv',
-             '/mount/src/marketing-intelligence-dashboard/business.csv'),
-            # Alternative Streamlit Cloud paths
-            ('/app/marketing-intelligence-dashboard/Facebook.csv',
-             '/app/marketing-intelligence-dashboard/Google.csv',
-             '/app/marketing-intelligence-dashboard/TikTok.csv',
-             '/app/marketing-intelligence-dashboard/business.csv')
-        ]
-        
-        facebook_df = None
-        google_df = None
-        tiktok_df = None
-        business_df = None
+        sources = find_data_sources()
         
-        
-        for i, (fb_path, go_path, tt_path, bus_path) in enumerate(file_paths):
-            try:
-                facebook_df = pd.read_csv(fb_path)
-                google_df = pd.read_csv(go_path)
-                tiktok_df = pd.read_csv(tt_path)
-                business_df = pd.read_csv(bus_path)
-                break
-            except FileNotFoundError:
-                continue
-        
-        if facebook_df is None:
+        if sources is None:
             raise FileNotFoundError("Could not find CSV files in any expected location")
         
-        # Convert date columns
-        for df in [facebook_df, google_df, tiktok_df, business_df]:
-            df['date'] = pd.to_datetime(df['date'])
-        
-        # Add platform column to marketing data
-        facebook_df['platform'] = 'Facebook'
-        google_df['platform'] = 'Google'
-        tiktok_df['platform'] = 'TikTok'
+        # Each platform's rows and daily cube come from the columnar cache
+        # next to its CSV unless that file's size or mtime changed, so only
+        # a new or updated channel is parsed again; sources load concurrently
+        loaded = run_parallel(
+            [(load_platform_source, source) for source in sources.platforms]
+            + [(load_business_source, sources.business_path)],
+            LOADER_WORKERS, LOADER_POOL
+        )
+        platform_data, business_df = loaded[:-1], loaded[-1]
         
-        # Combine all marketing data
-        marketing_df = pd.concat([facebook_df, google_df, tiktok_df], ignore_index=True)
+        # Combine all marketing data; platforms never share a cube cell, so
+        # their cubes stack without being aggregated again, each one the
+        # contiguous block of its platform's partitions
+        marketing_df = concat_frames([rows for rows, _ in platform_data])
+        marketing_cube = concat_frames([cube for _, cube in platform_data])
         
     except FileNotFoundError:
         st.warning("⚠️ CSV files not found. Using sample data for demonstration.")
-        marketing_df, business_df = generate_sample_data()
+        marketing_df, business_df = generate_sample_data(SAMPLE_DAYS, SAMPLE_STATES, SAMPLE_CAMPAIGNS, SAMPLE_SEED)
+        marketing_df = compact_marketing_frame(marketing_df)
+        business_df = compact_business_frame(business_df)
         
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         st.warning("Using sample data for demonstration.")
-        marketing_df, business_df = generate_sample_data()
+        marketing_df, business_df = generate_sample_data(SAMPLE_DAYS, SAMPLE_STATES, SAMPLE_CAMPAIGNS, SAMPLE_SEED)
+        marketing_df = compact_marketing_frame(marketing_df)
+        business_df = compact_business_frame(business_df)
     
-    # Calculate marketing metrics
-    marketing_df['ctr'] = (marketing_df['clicks'] / marketing_df['impressions'] * 100).round(2)
-    marketing_df['roas'] = (marketing_df['attributed_revenue'] / marketing_df['spend']).round(2)
-    marketing_df['cpc'] = (marketing_df['spend'] / marketing_df['clicks']).round(2)
-    marketing_df['cpm'] = (marketing_df['spend'] / marketing_df['impressions'] * 1000).round(2)
+    # Keep every frame sorted by date so range filters can binary-search it
+    marketing_df = marketing_df.sort_values('date', kind='stable', ignore_index=True)
+    business_df = business_df.sort_values('date', kind='stable', ignore_index=True)
     
-    # Calculate business metrics
-    business_df['aov'] = (business_df['total_revenue'] / business_df['orders']).round(2)
-    business_df['conversion_rate'] = (business_df['new_orders'] / business_df['orders'] * 100).round(2)
-    business_df['profit_margin'] = (business_df['gross_profit'] / business_df['total_revenue'] * 100).round(2)
+    # Every view reads the pre-aggregated cube instead of the raw rows
+    if marketing_cube is None:
+        marketing_cube = build_marketing_cube(marketing_df)
     
-    return marketing_df, business_df
+    return marketing_df, business_df, marketing_cube
 
-def create_kpi_cards(marketing_df, business_df, selected_date_range):
+@st.cache_data(ttl=3600)  # Cache for 1 hour to reduce file system access
+def load_and_process_data(sources_version=None):
+    """Load and process all datasets; sources_version keys the cache to the source files"""
+    marketing_df, business_df, marketing_cube = read_and_process_data()
+    return marketing_df, business_df, marketing_cube, build_kpi_prefix_sums(marketing_cube, business_df, marketing_df)
+
+@st.cache_resource(ttl=3600, max_entries=2)
+def load_shared_data(sources_version=None):
+    """Open the memory-mapped dataset shared by every session, writing it on first use"""
+    sources = find_data_sources()
+    
+    if sources is None:
+        # Sample data has nothing on disk to map
+        marketing_df, business_df, marketing_cube = read_and_process_data()
+        return marketing_df, business_df, marketing_cube, build_kpi_prefix_sums(marketing_cube, business_df, marketing_df)
+    
+    store_dir = mmap_store_dir(sources.paths, MMAP_DIR)
+    
+    if not os.path.isdir(store_dir):
+        marketing_df, business_df, marketing_cube = read_and_process_data()
+        
+        try:
+            write_mmap_store(
+                {'marketing': marketing_df, 'business': business_df, 'cube': marketing_cube},
+                store_dir
+            )
+        except OSError:
+            # Without a writable location this process keeps its own copy
+            return marketing_df, business_df, marketing_cube, build_kpi_prefix_sums(marketing_cube, business_df, marketing_df)
+    
+    # Read-only views over the page cache; nothing here is copied per session
+    try:
+        frames = open_mmap_store(store_dir)
+    except FileNotFoundError:
+        # Another process pruned the store after the check above; this
+        # process keeps its own copy until the next load
+        marketing_df, business_df, marketing_cube = read_and_process_data()
+        return marketing_df, business_df, marketing_cube, build_kpi_prefix_sums(marketing_cube, business_df, marketing_df)
+    return (
+        frames['marketing'],
+        frames['business'],
+        frames['cube'],
+        build_kpi_prefix_sums(frames['cube'], frames['business'], frames['marketing'])
+    )
+
+@st.cache_data(ttl=3600)
+def load_streamed_data(sources_version=None):
+    """Stream the platform CSVs into the daily cube within the chunk memory budget"""
+    sources = find_data_sources()
+    
+    if sources is None:
+        return load_and_process_data()
+    
+    total_bytes = sum(os.path.getsize(source.path) for source in sources.platforms)
+    
+    # A raw chunk, its processed copy and the partial cube are alive at
+    # once, next to the running cube, so each chunk gets a quarter of the
+    # budget; the running cube itself is not counted
+    chunk_bytes = CHUNK_BUDGET_MB * 1024 ** 2 / 4
+    
+    progress_bar = st.progress(0.0, text="📥 Streaming marketing data...")
+    cube_accumulator = CubeAccumulator()
+    done_bytes = 0
+    
+    try:
+        for source in sources.platforms:
+            def report_progress(read_bytes, _, platform=source.platform):
+                progress_bar.progress(
+                    min((done_bytes + read_bytes) / max(total_bytes, 1), 1.0),
+                    text=f"📥 Streaming {platform} data..."
+                )
+            
+            for chunk in iter_csv_chunks(source.path, chunk_bytes, report_progress):
+                cube_accumulator.add(build_marketing_cube(process_marketing_rows(chunk, source.platform)))
+            
+            done_bytes += os.path.getsize(source.path)
+        
+        marketing_cube = cube_accumulator.cube()
+        
+        business_df = load_business_source(sources.business_path).sort_values('date', kind='stable', ignore_index=True)
+    except Exception as e:
+        st.error(f"Error loading data: {str(e)}")
+        return load_and_process_data()
+    finally:
+        progress_bar.empty()
+    
+    # Raw rows are never held in this mode; every view reads the cube
+    marketing_df = pd.DataFrame()
+    return marketing_df, business_df, marketing_cube, build_kpi_prefix_sums(marketing_cube, business_df, marketing_df)
+
+class IncrementalDataset:
+    """Process-wide dataset kept current by ingesting only rows appended to the CSVs"""
+    
+    def __init__(self):
+        self.marketing_sources = {}
+        self.business_source = None
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.snapshot = None
+        self.version = None
+    
+    def refresh(self):
+        """Fold in new rows and sources since the last check and return the current data and its version"""
+        with self.lock:
+            if self.snapshot is not None and time.monotonic() - self.checked_at < REFRESH_SECONDS:
+                return self.snapshot, self.version
+            
+            try:
+                self._ingest()
+            except Exception:
+                # Start over from the top of every file on the next call
+                self._reset()
+                raise
+            
+            self.checked_at = time.monotonic()
+            return (self.snapshot, self.version) if self.snapshot is not None else None
+    
+    def _reset(self):
+        self.marketing_sources = {}
+        self.business_source = None
+        self.snapshot = None
+    
+    def _sync_sources(self):
+        """Track the registered sources; returns False when none are found"""
+        sources = find_data_sources()
+        
+        if sources is None:
+            self._reset()
+            return False
+        
+        # A removed or moved source leaves rows behind that can't be
+        # subtracted from the cube, so everything is read again
+        removed = set(self.marketing_sources) - set(sources.platforms)
+        if removed or (self.business_source is not None and self.business_source.path != sources.business_path):
+            self._reset()
+        
+        if self.business_source is None:
+            self.business_source = AppendOnlySource(sources.business_path, process_business_rows, load_business_source)
+        
+        # A new source starts at the top of its file and merges in like appended rows
+        for source in sources.platforms:
+            if source not in self.marketing_sources:
+                self.marketing_sources[source] = AppendOnlySource(
+                    source.path,
+                    lambda rows, platform=source.platform: process_marketing_rows(rows, platform),
+                    lambda path, platform=source.platform: load_marketing_source(path, platform)
+                )
+        return True
+    
+    def _ingest(self):
+        if not self._sync_sources():
+            return
+        
+        sources = list(self.marketing_sources.values()) + [self.business_source]
+        
+        # Sources hold their own read offsets, so only threads can share them
+        read_tasks = [(source.read_rows,) for source in sources]
+        appended = run_parallel(read_tasks, LOADER_WORKERS)
+        
+        # A rewritten file invalidates everything derived from it
+        if self.snapshot is not None and any(rewritten for _, rewritten in appended):
+            for source in sources:
+                source.reset()
+            self.snapshot = None
+            appended = run_parallel(read_tasks, LOADER_WORKERS)
+        
+        marketing_rows = [rows for rows, _ in appended[:-1] if rows is not None]
+        business_rows = appended[-1][0]
+        
+        if self.snapshot is None:
+            marketing_df = concat_frames(marketing_rows)
+            marketing_df = marketing_df.sort_values('date', kind='stable', ignore_index=True)
+            business_df = business_rows.sort_values('date', kind='stable', ignore_index=True)
+            marketing_cube = build_marketing_cube(marketing_df)
+            campaign_index = None
+        else:
+            marketing_df, business_df, marketing_cube, kpi_prefix_sums = self.snapshot
+            campaign_index = kpi_prefix_sums['campaigns']
+            if not marketing_rows and business_rows is None:
+                return
+            
+            if marketing_rows:
+                new_rows = concat_frames(marketing_rows)
+                new_rows = new_rows.sort_values('date', kind='stable', ignore_index=True)
+                
+                # Rows landing after the last date extend the campaign index;
+                # earlier ones reorder the frame, so it is built again
+                if len(marketing_df) and new_rows['date'].iloc[0] < marketing_df['date'].iloc[-1]:
+                    campaign_index = None
+                else:
+                    campaign_index = extend_campaign_index(campaign_index, new_rows)
+                marketing_df = append_date_sorted(marketing_df, new_rows)
+                marketing_cube = merge_marketing_cubes(marketing_cube, build_marketing_cube(new_rows))
+            if business_rows is not None:
+                business_df = append_date_sorted(
+                    business_df, business_rows.sort_values('date', kind='stable', ignore_index=True)
+                )
+        
+        # Prefix sums are rebuilt from the cube, so their cost tracks cube
+        # cells; the campaign index is carried over or extended above
+        self.snapshot = (
+            marketing_df,
+            business_df,
+            marketing_cube,
+            build_kpi_prefix_sums(marketing_cube, business_df, marketing_df, campaign_index)
+        )
+        self.version = time.monotonic_ns()
+
+@st.cache_resource
+def get_incremental_dataset():
+    """The incremental dataset for this process"""
+    return IncrementalDataset()
+
+def load_incremental_data():
+    """Return the incremental dataset and its version, ingesting any newly appended rows first"""
+    dataset = get_incremental_dataset()
+    
+    try:
+        refreshed = dataset.refresh()
+        if refreshed is not None:
+            data, version = refreshed
+            return data, ('incremental', version)
+    except Exception as e:
+        st.error(f"Error loading data: {str(e)}")
+    
+    # Without any sources on disk the dashboard runs on sample data
+    return load_and_process_data(), ('sample',)
+
+def load_dashboard_data():
+    """Load the dataset through the configured loader mode
+
+    Returns the four data frames/arrays and a version that changes
+    whenever the loaded data does.
+    """
+    if LOADER_MODE == 'incremental':
+        data, dataset_version = load_incremental_data()
+        return data + (dataset_version,)
+    
+    # Cached loads are keyed by the sources' sizes and mtimes, so adding or
+    # updating an export reloads the data; unchanged sources come from cache
+    sources = find_data_sources()
+    sources_version = sources.fingerprint() if sources is not None else None
+    dataset_version = (LOADER_MODE, sources_version)
+    
+    if LOADER_MODE == 'mmap':
+        return load_shared_data(sources_version) + (dataset_version,)
+    if LOADER_MODE == 'streaming':
+        return load_streamed_data(sources_version) + (dataset_version,)
+    return load_and_process_data(sources_version) + (dataset_version,)
+
+@st.cache_resource
+def get_view_cache():
+    """The computed-view cache shared by every session of this process"""
+    return LRUResultCache(VIEW_CACHE_SIZE)
+
+def cached_view(view, dataset_version, filter_spec, compute, options=()):
+    """Serve a view from the shared cache, computing it on a miss
+
+    options holds any view settings besides the filters, e.g. the trend grain.
+    """
+    # Empty views aren't kept so they still show why they are empty
+    def cacheable(result):
+        figure = result[0] if isinstance(result, tuple) else result
+        return figure is not None
+    
+    return get_view_cache().get_or_compute((view, dataset_version, filter_spec) + tuple(options), compute, cacheable)
+
+def append_date_sorted(df, new_rows):
+    """Append date-sorted rows to a date-sorted frame, keeping it sorted"""
+    combined = concat_frames([df, new_rows])
+    
+    # Appends normally start on or after the last date already held
+    if len(df) and len(new_rows) and new_rows['date'].iloc[0] < df['date'].iloc[-1]:
+        combined = combined.sort_values('date', kind='stable', ignore_index=True)
+    return combined
+
+def create_kpi_cards(kpi_prefix_sums, filter_spec):
     """Create KPI cards for the dashboard"""
-    if marketing_df.empty or business_df.empty:
+    kpis = compute_kpis(kpi_prefix_sums, filter_spec)
+    
+    if kpis is None:
         st.error("No data available")
         return
     
-    # Convert date range to datetime for comparison
-    start_date = pd.to_datetime(selected_date_range[0])
-    end_date = pd.to_datetime(selected_date_range[1])
-    
-    # Filter data by date range
-    marketing_filtered = marketing_df[
-        (marketing_df['date'] >= start_date) & 
-        (marketing_df['date'] <= end_date)
-    ]
-    business_filtered = business_df[
-        (business_df['date'] >= start_date) & 
-        (business_df['date'] <= end_date)
-    ]
-    
-    # Calculate comprehensive KPIs
-    total_spend = marketing_filtered['spend'].sum()
-    total_revenue = marketing_filtered['attributed_revenue'].sum()
-    total_impressions = marketing_filtered['impressions'].sum()
-    total_clicks = marketing_filtered['clicks'].sum()
-    avg_roas = marketing_filtered['roas'].mean() if len(marketing_filtered) > 0 else 0
-    avg_ctr = marketing_filtered['ctr'].mean() if len(marketing_filtered) > 0 else 0
-    avg_cpc = total_spend / total_clicks if total_clicks > 0 else 0
-    avg_cpm = (total_spend / total_impressions * 1000) if total_impressions > 0 else 0
-    
-    business_revenue = business_filtered['total_revenue'].sum()
-    business_orders = business_filtered['orders'].sum()
-    business_profit = business_filtered['gross_profit'].sum()
-    avg_aov = business_filtered['aov'].mean() if len(business_filtered) > 0 else 0
-    profit_margin = (business_profit / business_revenue * 100) if business_revenue > 0 else 0
-    attribution_rate = (total_revenue / business_revenue * 100) if business_revenue > 0 else 0
-    
     # Create enhanced KPI cards
     st.markdown('<div class="kpi-container">', unsafe_allow_html=True)
     
@@ -345,85 +635,63 @@ def create_kpi_cards(marketing_df, business_df, selected_date_range):
     with col1:
         st.metric(
             label="💰 Total Marketing Spend",
-            value=f"${total_spend:,.0f}",
-            delta=f"CPC: ${avg_cpc:.2f}"
+            value=f"${kpis.total_spend:,.0f}",
+            delta=f"CPC: ${kpis.cpc:.2f}"
         )
         st.metric(
             label="📊 Average ROAS",
-            value=f"{avg_roas:.1f}x",
-            delta=f"CPM: ${avg_cpm:.2f}"
+            value=f"{kpis.roas:.1f}x",
+            delta=f"CPM: ${kpis.cpm:.2f}"
         )
     
     with col2:
         st.metric(
             label="📈 Attributed Revenue",
-            value=f"${total_revenue:,.0f}",
-            delta=f"CTR: {avg_ctr:.2f}%"
+            value=f"${kpis.total_revenue:,.0f}",
+            delta=f"CTR: {kpis.ctr:.2f}%"
         )
         st.metric(
             label="👆 Total Clicks",
-            value=f"{total_clicks:,}",
-            delta=f"Impressions: {total_impressions:,}"
+            value=f"{kpis.total_clicks:,}",
+            delta=f"Impressions: {kpis.total_impressions:,}"
         )
     
     with col3:
         st.metric(
             label="🛒 Total Orders",
-            value=f"{business_orders:,}",
-            delta=f"AOV: ${avg_aov:.0f}"
+            value=f"{kpis.business_orders:,}",
+            delta=f"AOV: ${kpis.aov:.0f}"
         )
         st.metric(
             label="💵 Business Revenue",
-            value=f"${business_revenue:,.0f}",
-            delta=f"Profit: ${business_profit:,.0f}"
+            value=f"${kpis.business_revenue:,.0f}",
+            delta=f"Profit: ${kpis.business_profit:,.0f}"
         )
     
     with col4:
         st.metric(
             label="📊 Profit Margin",
-            value=f"{profit_margin:.1f}%",
-            delta=f"Attribution: {attribution_rate:.1f}%"
+            value=f"{kpis.profit_margin:.1f}%",
+            delta=f"Attribution: {kpis.attribution_rate:.1f}%"
         )
         st.metric(
             label="🎯 Conversion Rate",
-            value=f"{(total_clicks/total_impressions*100):.2f}%" if total_impressions > 0 else "0%",
-            delta=f"Efficiency: {avg_roas*avg_ctr:.1f}"
+            value=f"{kpis.conversion_rate:.2f}%" if kpis.total_impressions > 0 else "0%",
+            delta=f"Efficiency: {kpis.roas*kpis.ctr:.1f}"
         )
     
     st.markdown('</div>', unsafe_allow_html=True)
 
-def create_platform_comparison(marketing_df, selected_date_range):
-    """Create platform comparison charts"""
-    if marketing_df.empty:
+def report_empty_summary(summary):
+    """Explain why a summary has no rows"""
+    if summary.status == STATUS_NO_DATA:
         st.error("No marketing data available")
-        return None, pd.DataFrame()
-    
-    # Convert date range to datetime for comparison
-    start_date = pd.to_datetime(selected_date_range[0])
-    end_date = pd.to_datetime(selected_date_range[1])
-    
-    marketing_filtered = marketing_df[
-        (marketing_df['date'] >= start_date) & 
-        (marketing_df['date'] <= end_date)
-    ]
-    
-    if len(marketing_filtered) == 0:
+    else:
         st.warning("No data available for selected date range")
-        return None, pd.DataFrame()
-    
-    # Platform performance summary
-    platform_summary = marketing_filtered.groupby('platform').agg({
-        'spend': 'sum',
-        'attributed_revenue': 'sum',
-        'impressions': 'sum',
-        'clicks': 'sum',
-        'roas': 'mean',
-        'ctr': 'mean'
-    }).round(2)
-    
-    # Create comprehensive platform comparison with subplots
-    from plotly.subplots import make_subplots
-    
+
+@st.cache_resource
+def platform_comparison_template():
+    """Skeleton of the platform comparison, built once per process: grid, styling and one empty bar per panel"""
     fig = make_subplots(
         rows=2, cols=2,
         subplot_titles=('Spend by Platform', 'Revenue by Platform', 'ROAS by Platform', 'CTR by Platform'),
@@ -436,60 +704,13 @@ def create_platform_comparison(marketing_df, selected_date_range):
     # Color palette
     colors = ['#667eea', '#764ba2', '#f093fb']
     
-    # Spend chart
-    fig.add_trace(
-        go.Bar(
-            x=platform_summary.index, 
-            y=platform_summary['spend'], 
-            name='Spend', 
-            marker_color=colors[0],
-            text=platform_summary['spend'].apply(lambda x: f'${x:,.0f}'),
-            textposition='auto'
-        ),
-        row=1, col=1
-    )
-    
-    # Revenue chart
-    fig.add_trace(
-        go.Bar(
-            x=platform_summary.index, 
-            y=platform_summary['attributed_revenue'], 
-            name='Revenue', 
-            marker_color=colors[1],
-            text=platform_summary['attributed_revenue'].apply(lambda x: f'${x:,.0f}'),
-            textposition='auto'
-        ),
-        row=1, col=2
-    )
-    
-    # ROAS chart
-    fig.add_trace(
-        go.Bar(
-            x=platform_summary.index, 
-            y=platform_summary['roas'], 
-            name='ROAS', 
-            marker_color=colors[2],
-            text=platform_summary['roas'].apply(lambda x: f'{x:.1f}x'),
-            textposition='auto'
-        ),
-        row=2, col=1
-    )
-    
-    # CTR chart
-    fig.add_trace(
-        go.Bar(
-            x=platform_summary.index, 
-            y=platform_summary['ctr'], 
-            name='CTR', 
-            marker_color='#ff6b6b',
-            text=platform_summary['ctr'].apply(lambda x: f'{x:.2f}%'),
-            textposition='auto'
-        ),
-        row=2, col=2
-    )
+    fig.add_trace(go.Bar(name='Spend', marker_color=colors[0], textposition='auto'), row=1, col=1)
+    fig.add_trace(go.Bar(name='Revenue', marker_color=colors[1], textposition='auto'), row=1, col=2)
+    fig.add_trace(go.Bar(name='ROAS', marker_color=colors[2], textposition='auto'), row=2, col=1)
+    fig.add_trace(go.Bar(name='CTR', marker_color='#ff6b6b', textposition='auto'), row=2, col=2)
     
     fig.update_layout(
-        height=600, 
+        height=600,
         showlegend=False,
         title_text="",
         margin=dict(l=20, r=20, t=40, b=20),
@@ -503,36 +724,74 @@ def create_platform_comparison(marketing_df, selected_date_range):
         for j in range(1, 3):
             fig.update_xaxes(tickangle=45, row=i, col=j)
     
+    return fig.to_dict()
+
+def figure_from_template(template, trace_data):
+    """A figure from a cached skeleton with each trace's data arrays swapped in
+    
+    The skeleton was validated when it was built, so the figure is put
+    together without validating it again; only the data arrays are new and
+    they are plain arrays and label lists. The skeleton itself is never
+    modified.
+    """
+    data = [dict(trace, **values) for trace, values in zip(template['data'], trace_data)]
+    return go.Figure({'data': data, 'layout': template['layout']}, _validate=False)
+
+def create_platform_comparison(marketing_cube, filter_spec):
+    """Create platform comparison charts"""
+    summary = summarize_platforms(marketing_cube, filter_spec)
+    
+    if summary.status != STATUS_OK:
+        report_empty_summary(summary)
+        return None, summary.table
+    
+    platform_summary = summary.table
+    timer = start_stages('platform_comparison')
+    
+    # Spend, revenue, ROAS and CTR bars over the prebuilt grid
+    platforms = platform_summary.index.to_numpy()
+    fig = figure_from_template(platform_comparison_template(), [
+        dict(
+            x=platforms,
+            y=platform_summary['spend'].to_numpy(),
+            text=[f'${x:,.0f}' for x in platform_summary['spend']]
+        ),
+        dict(
+            x=platforms,
+            y=platform_summary['attributed_revenue'].to_numpy(),
+            text=[f'${x:,.0f}' for x in platform_summary['attributed_revenue']]
+        ),
+        dict(
+            x=platforms,
+            y=platform_summary['roas'].to_numpy(),
+            text=[f'{x:.1f}x' for x in platform_summary['roas']]
+        ),
+        dict(
+            x=platforms,
+            y=platform_summary['ctr'].to_numpy(),
+            text=[f'{x:.2f}%' for x in platform_summary['ctr']]
+        )
+    ])
+    
+    timer.lap('figure')
     return fig, platform_summary
 
-def create_tactic_analysis(marketing_df, selected_date_range):
+def point_annotations(x, y, text, **style):
+    """Annotations labelling many points, for one layout update instead of an add_annotation call each"""
+    # Every add_annotation call re-validates the whole annotation list, so
+    # labelling point by point grows quadratically with the points
+    return [dict(x=x_value, y=y_value, text=label, **style) for x_value, y_value, label in zip(x, y, text)]
+
+def create_tactic_analysis(marketing_cube, filter_spec):
     """Create tactic performance analysis"""
-    if marketing_df.empty:
-        st.error("No marketing data available")
-        return None, pd.DataFrame()
-    
-    # Convert date range to datetime for comparison
-    start_date = pd.to_datetime(selected_date_range[0])
-    end_date = pd.to_datetime(selected_date_range[1])
+    summary = summarize_tactics(marketing_cube, filter_spec)
     
-    marketing_filtered = marketing_df[
-        (marketing_df['date'] >= start_date) & 
-        (marketing_df['date'] <= end_date)
-    ]
-    
-    if len(marketing_filtered) == 0:
-        st.warning("No data available for selected date range")
-        return None, pd.DataFrame()
+    if summary.status != STATUS_OK:
+        report_empty_summary(summary)
+        return None, summary.table
     
-    # Tactic performance
-    tactic_summary = marketing_filtered.groupby('tactic').agg({
-        'spend': 'sum',
-        'attributed_revenue': 'sum',
-        'roas': 'mean',
-        'ctr': 'mean',
-        'impressions': 'sum',
-        'clicks': 'sum'
-    }).round(2).sort_values('roas', ascending=False)
+    tactic_summary = summary.table
+    timer = start_stages('tactic_analysis')
     
     # Create comprehensive tactic analysis with scatter plot
     fig = px.scatter(
@@ -567,12 +826,12 @@ def create_tactic_analysis(marketing_df, selected_date_range):
         )
     )
     
-    # Add annotations for each tactic
-    for i, row in tactic_summary.reset_index().iterrows():
-        fig.add_annotation(
-            x=row['spend'],
-            y=row['attributed_revenue'],
-            text=row['tactic'],
+    # Label every tactic in the same layout update as the styling below
+    fig.update_layout(
+        annotations=point_annotations(
+            tactic_summary['spend'],
+            tactic_summary['attributed_revenue'],
+            tactic_summary.index,
             showarrow=True,
             arrowhead=2,
             arrowsize=1,
@@ -581,9 +840,7 @@ def create_tactic_analysis(marketing_df, selected_date_range):
             ax=20,
             ay=-30,
             font=dict(size=10, color='#2c3e50')
-        )
-    
-    fig.update_layout(
+        ),
         height=500, 
         showlegend=True,
         title_text="",
@@ -600,91 +857,57 @@ def create_tactic_analysis(marketing_df, selected_date_range):
         )
     )
     
+    timer.lap('figure')
     return fig, tactic_summary
 
-def create_trend_analysis(marketing_df, business_df, selected_date_range):
-    """Create trend analysis over time"""
-    if marketing_df.empty or business_df.empty:
-        st.error("No data available")
-        return None
-    
-    # Convert date range to datetime for comparison
-    start_date = pd.to_datetime(selected_date_range[0])
-    end_date = pd.to_datetime(selected_date_range[1])
-    
-    marketing_filtered = marketing_df[
-        (marketing_df['date'] >= start_date) & 
-        (marketing_df['date'] <= end_date)
-    ]
-    business_filtered = business_df[
-        (business_df['date'] >= start_date) & 
-        (business_df['date'] <= end_date)
-    ]
-    
-    # Daily aggregations
-    daily_marketing = marketing_filtered.groupby('date').agg({
-        'spend': 'sum',
-        'attributed_revenue': 'sum',
-        'impressions': 'sum',
-        'clicks': 'sum'
-    }).reset_index()
-    
-    daily_marketing['roas'] = (daily_marketing['attributed_revenue'] / daily_marketing['spend']).round(2)
-    daily_marketing['ctr'] = (daily_marketing['clicks'] / daily_marketing['impressions'] * 100).round(2)
-    
-    # Create comprehensive trend analysis with multiple metrics
-    from plotly.subplots import make_subplots
-    
+def trend_points(x, y, dates=None):
+    """Data of a trend trace with the series reduced to the trend point budget
+    
+    Points are picked along dates, which default to x for series over time.
+    """
+    if dates is None:
+        dates = x
+    if TREND_DOWNSAMPLING == 'minmax':
+        keep = min_max_indices(y, TREND_POINT_BUDGET)
+    else:
+        keep = lttb_indices(dates, y, TREND_POINT_BUDGET)
+    
+    # WebGL draws large traces without one SVG node per point
+    trace_type = 'scattergl' if len(keep) > WEBGL_POINT_THRESHOLD else 'scatter'
+    return dict(type=trace_type, x=x.to_numpy()[keep], y=y.to_numpy()[keep])
+
+@st.cache_resource
+def trend_analysis_template(period):
+    """Skeleton of the trend analysis for one grain, built once per process: grid, styling and empty traces"""
     fig = make_subplots(
         rows=2, cols=2,
-        subplot_titles=('Daily Spend vs Revenue', 'ROAS Trend', 'Impressions vs Clicks', 'Business vs Marketing Revenue'),
+        subplot_titles=(f'{period} Spend vs Revenue', 'ROAS Trend', 'Impressions vs Clicks', 'Business vs Marketing Revenue'),
         specs=[[{"secondary_y": True}, {"type": "scatter"}],
                [{"type": "scatter"}, {"secondary_y": True}]],
         vertical_spacing=0.15,
         horizontal_spacing=0.1
     )
     
-    # Daily Spend vs Revenue
+    # Spend vs Revenue per period
     fig.add_trace(
-        go.Scatter(
-            x=daily_marketing['date'], 
-            y=daily_marketing['spend'], 
-            name='Spend', 
-            line=dict(color='#667eea', width=3),
-            mode='lines+markers'
-        ),
+        go.Scatter(name='Spend', line=dict(color='#667eea', width=3), mode='lines+markers'),
         row=1, col=1, secondary_y=False
     )
     fig.add_trace(
-        go.Scatter(
-            x=daily_marketing['date'], 
-            y=daily_marketing['attributed_revenue'], 
-            name='Revenue', 
-            line=dict(color='#764ba2', width=3),
-            mode='lines+markers'
-        ),
+        go.Scatter(name='Revenue', line=dict(color='#764ba2', width=3), mode='lines+markers'),
         row=1, col=1, secondary_y=True
     )
     
     # ROAS trend
     fig.add_trace(
-        go.Scatter(
-            x=daily_marketing['date'], 
-            y=daily_marketing['roas'], 
-            name='ROAS', 
-            line=dict(color='#f093fb', width=3),
-            mode='lines+markers',
-            fill='tonexty'
-        ),
+        go.Scatter(name='ROAS', line=dict(color='#f093fb', width=3), mode='lines+markers', fill='tonexty'),
         row=1, col=2
     )
     
     # Impressions vs Clicks
     fig.add_trace(
         go.Scatter(
-            x=daily_marketing['impressions'], 
-            y=daily_marketing['clicks'], 
-            name='Impressions vs Clicks', 
+            name='Impressions vs Clicks',
             mode='markers',
             marker=dict(
                 color='#ff6b6b',
@@ -698,23 +921,11 @@ def create_trend_analysis(marketing_df, business_df, selected_date_range):
     
     # Business vs Marketing Revenue
     fig.add_trace(
-        go.Scatter(
-            x=business_filtered['date'], 
-            y=business_filtered['total_revenue'], 
-            name='Business Revenue', 
-            line=dict(color='#4ecdc4', width=3),
-            mode='lines+markers'
-        ),
+        go.Scatter(name='Business Revenue', line=dict(color='#4ecdc4', width=3), mode='lines+markers'),
         row=2, col=2, secondary_y=False
     )
     fig.add_trace(
-        go.Scatter(
-            x=daily_marketing['date'], 
-            y=daily_marketing['attributed_revenue'], 
-            name='Marketing Revenue', 
-            line=dict(color='#45b7d1', width=3),
-            mode='lines+markers'
-        ),
+        go.Scatter(name='Marketing Revenue', line=dict(color='#45b7d1', width=3), mode='lines+markers'),
         row=2, col=2, secondary_y=True
     )
     
@@ -744,36 +955,43 @@ def create_trend_analysis(marketing_df, business_df, selected_date_range):
     fig.update_yaxes(title_text="Business Revenue ($)", row=2, col=2, secondary_y=False)
     fig.update_yaxes(title_text="Marketing Revenue ($)", row=2, col=2, secondary_y=True)
     
-    return fig
+    return fig.to_dict()
 
-def create_geographic_analysis(marketing_df, selected_date_range):
-    """Create geographic performance analysis"""
-    if marketing_df.empty:
-        st.error("No marketing data available")
-        return None, pd.DataFrame()
+def create_trend_analysis(kpi_prefix_sums, filter_spec, grain='day'):
+    """Create trend analysis over time at a day, week, month or quarter grain"""
+    series = compute_trend_series(kpi_prefix_sums, filter_spec, grain)
     
-    # Convert date range to datetime for comparison
-    start_date = pd.to_datetime(selected_date_range[0])
-    end_date = pd.to_datetime(selected_date_range[1])
+    if series.status != STATUS_OK:
+        st.error("No data available")
+        return None
     
-    marketing_filtered = marketing_df[
-        (marketing_df['date'] >= start_date) & 
-        (marketing_df['date'] <= end_date)
-    ]
+    marketing_series = series.marketing
+    business_series = series.business
+    timer = start_stages('trend_analysis')
+    
+    # The six series over the prebuilt grid of this grain
+    fig = figure_from_template(trend_analysis_template(TREND_GRAIN_TITLES[grain]), [
+        trend_points(marketing_series['date'], marketing_series['spend']),
+        trend_points(marketing_series['date'], marketing_series['attributed_revenue']),
+        trend_points(marketing_series['date'], marketing_series['roas']),
+        trend_points(marketing_series['impressions'], marketing_series['clicks'], dates=marketing_series['date']),
+        trend_points(business_series['date'], business_series['total_revenue']),
+        trend_points(marketing_series['date'], marketing_series['attributed_revenue'])
+    ])
+    
+    timer.lap('figure')
+    return fig
+
+def create_geographic_analysis(marketing_cube, filter_spec):
+    """Create geographic performance analysis"""
+    summary = summarize_states(marketing_cube, filter_spec)
     
-    if len(marketing_filtered) == 0:
-        st.warning("No data available for selected date range")
-        return None, pd.DataFrame()
+    if summary.status != STATUS_OK:
+        report_empty_summary(summary)
+        return None, summary.table
     
-    # State performance
-    state_summary = marketing_filtered.groupby('state').agg({
-        'spend': 'sum',
-        'attributed_revenue': 'sum',
-        'roas': 'mean',
-        'ctr': 'mean',
-        'impressions': 'sum',
-        'clicks': 'sum'
-    }).round(2).sort_values('spend', ascending=False)
+    state_summary = summary.table
+    timer = start_stages('geographic_analysis')
     
     # Create comprehensive geographic analysis
     fig = px.bar(
@@ -795,16 +1013,21 @@ def create_geographic_analysis(marketing_df, selected_date_range):
         textfont=dict(size=10, color='white')
     )
     
-    # Add secondary metric as text
-    for i, row in state_summary.head(10).reset_index().iterrows():
-        fig.add_annotation(
-            x=row['spend'] + max(state_summary['spend']) * 0.02,
-            y=row['state'],
-            text=f"ROAS: {row['roas']:.1f}x",
-            showarrow=False,
-            font=dict(size=9, color='#667eea'),
-            xanchor='left'
+    # Add secondary metric as one text trace beside the bars
+    top_states = state_summary.head(10)
+    fig.add_trace(
+        go.Scatter(
+            x=top_states['spend'] + state_summary['spend'].max() * 0.02,
+            y=top_states.index,
+            text=[f"ROAS: {roas:.1f}x" for roas in top_states['roas']],
+            mode='text',
+            textposition='middle right',
+            textfont=dict(size=9, color='#667eea'),
+            cliponaxis=False,
+            hoverinfo='skip',
+            showlegend=False
         )
+    )
     
     fig.update_layout(
         height=500,
@@ -821,110 +1044,104 @@ def create_geographic_analysis(marketing_df, selected_date_range):
         )
     )
     
+    timer.lap('figure')
     return fig, state_summary
 
+def create_campaign_drilldown(marketing_df, kpi_prefix_sums, filter_spec, rank_by='Spend', k=10, bottom=False):
+    """Create the top or bottom campaigns chart for the selected filters"""
+    if kpi_prefix_sums['campaigns'] is None:
+        st.info("Campaign drill-down needs the raw marketing rows, which streaming mode does not keep")
+        return None, pd.DataFrame()
+    
+    metric, axis_title, label = CAMPAIGN_RANK_METRICS[rank_by]
+    summary = rank_campaigns(marketing_df, kpi_prefix_sums, filter_spec, metric, k, ascending=bottom)
+    
+    if summary.status != STATUS_OK:
+        report_empty_summary(summary)
+        return None, summary.table
+    
+    campaign_summary = summary.table
+    timer = start_stages('campaign_drilldown')
+    
+    # One bar per campaign, the first ranked at the top
+    fig = go.Figure(
+        go.Bar(
+            x=campaign_summary[metric].to_numpy(),
+            y=campaign_summary.index.to_numpy(),
+            orientation='h',
+            marker_color='#ff6b6b' if bottom else '#667eea',
+            text=[label.format(x) for x in campaign_summary[metric]],
+            textposition='auto',
+            customdata=campaign_summary[['spend', 'attributed_revenue', 'roas']].to_numpy(),
+            hovertemplate='%{y}<br>Spend: $%{customdata[0]:,.0f}<br>Revenue: $%{customdata[1]:,.0f}'
+                          '<br>ROAS: %{customdata[2]:.2f}x<extra></extra>'
+        )
+    )
+    
+    fig.update_layout(
+        height=max(400, 28 * len(campaign_summary) + 80),
+        title_text="",
+        margin=dict(l=20, r=20, t=20, b=20),
+        font=dict(size=12, family="Inter"),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        xaxis_title=axis_title,
+        yaxis_title="Campaign",
+        yaxis=dict(autorange='reversed')
+    )
+    
+    timer.lap('figure')
+    return fig, campaign_summary
+
+def create_dashboard_tabs():
+    """Create the view tabs, tracking which one is open when tabs render lazily"""
+    if LAZY_TABS:
+        try:
+            return st.tabs(DASHBOARD_TABS, key='active_tab', on_change='rerun')
+        except TypeError:
+            # Streamlit releases without tab state render every tab
+            pass
+    return st.tabs(DASHBOARD_TABS)
 
-def create_insights(marketing_df, business_df, selected_date_range):
-    """Generate actionable insights"""
-    if marketing_df.empty or business_df.empty:
-        return ["No data available for insights"]
-    
-    # Convert date range to datetime for comparison
-    start_date = pd.to_datetime(selected_date_range[0])
-    end_date = pd.to_datetime(selected_date_range[1])
-    
-    marketing_filtered = marketing_df[
-        (marketing_df['date'] >= start_date) & 
-        (marketing_df['date'] <= end_date)
-    ]
-    business_filtered = business_df[
-        (business_df['date'] >= start_date) & 
-        (business_df['date'] <= end_date)
-    ]
-    
-    if len(marketing_filtered) == 0 or len(business_filtered) == 0:
-        return ["No data available for selected date range"]
-    
-    insights = []
-    
-    # Key metrics
-    total_spend = marketing_filtered['spend'].sum()
-    total_revenue = marketing_filtered['attributed_revenue'].sum()
-    avg_roas = marketing_filtered['roas'].mean()
-    avg_ctr = marketing_filtered['ctr'].mean()
-    total_clicks = marketing_filtered['clicks'].sum()
-    total_impressions = marketing_filtered['impressions'].sum()
-    
-    if total_spend > 0:
-        insights.append(f"💰 Performance Summary: ${total_spend:,.0f} spend generated ${total_revenue:,.0f} revenue with {avg_roas:.1f}x ROAS")
-    
-    # Platform analysis
-    platform_roas = marketing_filtered.groupby('platform')['roas'].mean().sort_values(ascending=False)
-    platform_spend = marketing_filtered.groupby('platform')['spend'].sum().sort_values(ascending=False)
-    
-    if len(platform_roas) > 0:
-        best_platform = platform_roas.index[0]
-        best_platform_roas = platform_roas.iloc[0]
-        worst_platform = platform_roas.index[-1]
-        worst_platform_roas = platform_roas.iloc[-1]
-        
-        insights.append(f"🏆 Platform Performance: {best_platform} leads with {best_platform_roas:.1f}x ROAS, while {worst_platform} needs optimization at {worst_platform_roas:.1f}x")
-    
-    # Tactic analysis
-    tactic_roas = marketing_filtered.groupby('tactic')['roas'].mean().sort_values(ascending=False)
-    tactic_spend = marketing_filtered.groupby('tactic')['spend'].sum().sort_values(ascending=False)
-    
-    if len(tactic_roas) > 0:
-        best_tactic = tactic_roas.index[0]
-        best_tactic_roas = tactic_roas.iloc[0]
-        insights.append(f"🚀 Best Performing Tactic: {best_tactic} delivers {best_tactic_roas:.1f}x ROAS - consider increasing budget allocation")
-    
-    # Geographic insights
-    state_roas = marketing_filtered.groupby('state')['roas'].mean().sort_values(ascending=False)
-    state_spend = marketing_filtered.groupby('state')['spend'].sum().sort_values(ascending=False)
-    
-    if len(state_roas) > 0:
-        best_state = state_roas.index[0]
-        best_state_roas = state_roas.iloc[0]
-        insights.append(f"📍 Geographic Opportunity: {best_state} shows highest ROAS at {best_state_roas:.1f}x - consider expanding presence")
-    
-    # Business insights
-    total_business_revenue = business_filtered['total_revenue'].sum()
-    total_business_profit = business_filtered['gross_profit'].sum()
-    
-    if total_business_revenue > 0:
-        attribution_rate = (total_revenue / total_business_revenue * 100)
-        profit_margin = (total_business_profit / total_business_revenue * 100)
-        insights.append(f"📊 Business Impact: Marketing drives {attribution_rate:.1f}% of total revenue with {profit_margin:.1f}% profit margin")
-    
-    # Efficiency insights
-    if avg_ctr < 2.0:
-        insights.append(f"🔍 Optimization Opportunity: CTR of {avg_ctr:.2f}% is below industry average - focus on ad creative and targeting")
-    
-    # Trend insights
-    daily_roas = marketing_filtered.groupby('date')['roas'].mean()
-    if len(daily_roas) > 7:
-        recent_roas = daily_roas.tail(7).mean()
-        previous_roas = daily_roas.head(7).mean()
-        roas_trend = ((recent_roas - previous_roas) / previous_roas * 100) if previous_roas > 0 else 0
-        
-        if roas_trend > 5:
-            insights.append(f"📈 Positive Trend: ROAS improved {roas_trend:.1f}% over the period - maintain current strategy")
-        elif roas_trend < -5:
-            insights.append(f"📉 Declining Performance: ROAS decreased {abs(roas_trend):.1f}% - review and optimize campaigns")
-    
-    # Budget allocation insights
-    if len(platform_spend) > 1:
-        top_platform_spend = platform_spend.iloc[0]
-        total_platform_spend = platform_spend.sum()
-        top_platform_share = (top_platform_spend / total_platform_spend * 100)
-        
-        if top_platform_share > 60:
-            insights.append(f"⚖️ Budget Concentration: {platform_spend.index[0]} receives {top_platform_share:.1f}% of budget - consider diversifying for risk mitigation")
-   
-    return insights
+def tab_is_open(tab):
+    """Whether a tab's content should be computed on this rerun"""
+    # Without tab state every tab renders, as open is None
+    return getattr(tab, 'open', None) is not False
+
+def render_chart(fig, view):
+    """Send a figure to the browser, timing its serialization"""
+    timer = start_stages(view)
+    st.plotly_chart(fig, width='stretch')
+    timer.lap('render')
+
+def create_diagnostics_panel(rerun_timings):
+    """Show the stage timings of this rerun in the sidebar"""
+    timings = pd.DataFrame(rerun_timings['stages'], columns=['view', 'stage', 'seconds'])
+    timings['ms'] = (timings.pop('seconds') * 1000).round(1)
+    
+    with st.sidebar:
+        with st.expander("⏱️ Diagnostics"):
+            st.metric("Rerun Time", f"{rerun_timings['total_seconds'] * 1000:,.0f} ms")
+            st.dataframe(timings, hide_index=True, width='stretch')
+            
+            # Hits and misses of the shared view cache since the process started
+            cache_stats = get_view_cache().stats()
+            st.caption(f"View cache: {cache_stats['entries']}/{cache_stats['max_entries']} entries, {cache_stats['evictions']} evicted")
+            st.dataframe(
+                pd.DataFrame.from_dict(cache_stats['views'], orient='index', columns=['hits', 'misses']),
+                width='stretch'
+            )
+            st.download_button(
+                "📥 Prometheus Metrics",
+                prometheus_text() + get_view_cache().prometheus_text(),
+                file_name="dashboard_metrics.prom",
+                mime="text/plain"
+            )
 
 def main():
+    begin_rerun(INSTRUMENTATION)
+    timer = start_stages('main')
+    
     # Enhanced header with gradient
     st.markdown('<h1 class="main-header">Marketing Intelligence Dashboard</h1>', unsafe_allow_html=True)
     
@@ -936,9 +1153,10 @@ def main():
     """, unsafe_allow_html=True)
     
     # Load data
-    marketing_df, business_df = load_and_process_data()
+    marketing_df, business_df, marketing_cube, kpi_prefix_sums, dataset_version = load_dashboard_data()
+    timer.lap('load')
     
-    if marketing_df.empty or business_df.empty:
+    if marketing_cube.empty or business_df.empty:
         st.error("Failed to load data. Please check that all CSV files are present or the app will use sample data.")
         return
     
@@ -947,8 +1165,7 @@ def main():
         st.markdown("### 🎛️ Dashboard Controls")
         
         # Date range filter
-        min_date = marketing_df['date'].min().date()
-        max_date = marketing_df['date'].max().date()
+        min_date, max_date = (day.date() for day in data_date_bounds(kpi_prefix_sums))
         
         selected_date_range = st.date_input(
             "📅 Date Range",
@@ -962,21 +1179,29 @@ def main():
         if len(selected_date_range) != 2:
             selected_date_range = (min_date, max_date)
         
+        # Time grain of the trend charts
+        grain_choice = st.selectbox(
+            "🕒 Trend Grain",
+            options=TREND_GRAIN_OPTIONS,
+            index=0,
+            help="Period each trend point covers; Auto picks days, weeks, months or quarters from the range length"
+        )
+        
         st.markdown("---")
         
         # Platform filter
         platforms = st.multiselect(
             "🌐 Platforms",
-            options=marketing_df['platform'].unique(),
-            default=marketing_df['platform'].unique(),
+            options=marketing_cube['platform'].unique(),
+            default=marketing_cube['platform'].unique(),
             help="Select marketing platforms to analyze"
         )
         
         # Tactic filter
         tactics = st.multiselect(
             "🎯 Tactics",
-            options=marketing_df['tactic'].unique(),
-            default=marketing_df['tactic'].unique(),
+            options=marketing_cube['tactic'].unique(),
+            default=marketing_cube['tactic'].unique(),
             help="Select marketing tactics to analyze"
         )
         
@@ -995,66 +1220,128 @@ def main():
             options=['ROAS', 'CTR', 'CPC', 'CPM', 'Revenue', 'Spend'],
             default=['ROAS', 'CTR', 'Revenue']
         )
+        
+        # Footprint of the compact frames held by this replica
+        with st.expander("💾 Memory Usage"):
+            st.dataframe(
+                memory_report({
+                    'Marketing rows': marketing_df,
+                    'Business rows': business_df,
+                    'Daily cube': marketing_cube
+                }),
+                width='stretch'
+            )
+    
+    timer.lap('controls')
     
-    # Filter data based on selections
-    marketing_df = marketing_df[
-        (marketing_df['platform'].isin(platforms)) &
-        (marketing_df['tactic'].isin(tactics))
-    ]
+    # One spec for every selection, pushed down into each view: the window
+    # is a binary-searched slice of the cube and platform/tactic masks are
+    # built only for narrowed dimensions and only over that slice
+    filter_spec = make_filter_spec(kpi_prefix_sums, selected_date_range, platforms, tactics)
+    grain = choose_grain(filter_spec) if grain_choice == 'Auto' else grain_choice.lower()
+    timer.lap('filter')
     
     # Add loading animation
     with st.spinner('🔄 Loading dashboard data...'):
         # KPI Cards
-        create_kpi_cards(marketing_df, business_df, selected_date_range)
+        create_kpi_cards(kpi_prefix_sums, filter_spec)
+        timer.lap('kpi_cards')
         
         # Create tabs for better organization
-        tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Performance", "🎯 Tactics", "📈 Trends", "🗺️ Geography", "💡 Insights"])
+        tab1, tab2, tab3, tab4, tab5, tab6 = create_dashboard_tabs()
         
         with tab1:
-            st.markdown('<div class="section-header">Platform Performance Analysis</div>', unsafe_allow_html=True)
-            platform_fig, platform_summary = create_platform_comparison(marketing_df, selected_date_range)
-            if platform_fig:
-                st.plotly_chart(platform_fig, width='stretch')
-            
-            if show_data_tables:
-                st.markdown("#### 📋 Platform Summary Data")
-                st.dataframe(platform_summary, width='stretch')
+            if tab_is_open(tab1):
+                st.markdown('<div class="section-header">Platform Performance Analysis</div>', unsafe_allow_html=True)
+                platform_fig, platform_summary = cached_view(
+                    'platform_comparison', dataset_version, filter_spec,
+                    lambda: create_platform_comparison(marketing_cube, filter_spec)
+                )
+                if platform_fig:
+                    render_chart(platform_fig, 'platform_comparison')
+                
+                if show_data_tables:
+                    st.markdown("#### 📋 Platform Summary Data")
+                    st.dataframe(platform_summary, width='stretch')
         
         with tab2:
-            st.markdown('<div class="section-header">Tactic Performance Analysis</div>', unsafe_allow_html=True)
-            tactic_fig, tactic_summary = create_tactic_analysis(marketing_df, selected_date_range)
-            if tactic_fig:
-                st.plotly_chart(tactic_fig, width='stretch')
-            
-            if show_data_tables:
-                st.markdown("#### 📋 Tactic Summary Data")
-                st.dataframe(tactic_summary, width='stretch')
+            if tab_is_open(tab2):
+                st.markdown('<div class="section-header">Tactic Performance Analysis</div>', unsafe_allow_html=True)
+                tactic_fig, tactic_summary = cached_view(
+                    'tactic_analysis', dataset_version, filter_spec,
+                    lambda: create_tactic_analysis(marketing_cube, filter_spec)
+                )
+                if tactic_fig:
+                    render_chart(tactic_fig, 'tactic_analysis')
+                
+                if show_data_tables:
+                    st.markdown("#### 📋 Tactic Summary Data")
+                    st.dataframe(tactic_summary, width='stretch')
         
         with tab3:
-            st.markdown('<div class="section-header">Trend Analysis Over Time</div>', unsafe_allow_html=True)
-            trend_fig = create_trend_analysis(marketing_df, business_df, selected_date_range)
-            if trend_fig:
-                st.plotly_chart(trend_fig, width='stretch')
+            if tab_is_open(tab3):
+                st.markdown('<div class="section-header">Trend Analysis Over Time</div>', unsafe_allow_html=True)
+                trend_fig = cached_view(
+                    'trend_analysis', dataset_version, filter_spec,
+                    lambda: create_trend_analysis(kpi_prefix_sums, filter_spec, grain),
+                    options=(grain,)
+                )
+                if trend_fig:
+                    render_chart(trend_fig, 'trend_analysis')
         
         with tab4:
-            st.markdown('<div class="section-header">Geographic Performance</div>', unsafe_allow_html=True)
-            geo_fig, state_summary = create_geographic_analysis(marketing_df, selected_date_range)
-            if geo_fig:
-                st.plotly_chart(geo_fig, width='stretch')
-            
-            if show_data_tables:
-                st.markdown("#### 📋 State Performance Data")
-                st.dataframe(state_summary.head(10), width='stretch')
+            if tab_is_open(tab4):
+                st.markdown('<div class="section-header">Geographic Performance</div>', unsafe_allow_html=True)
+                geo_fig, state_summary = cached_view(
+                    'geographic_analysis', dataset_version, filter_spec,
+                    lambda: create_geographic_analysis(marketing_cube, filter_spec)
+                )
+                if geo_fig:
+                    render_chart(geo_fig, 'geographic_analysis')
+                
+                if show_data_tables:
+                    st.markdown("#### 📋 State Performance Data")
+                    st.dataframe(state_summary.head(10), width='stretch')
         
         with tab5:
-            if show_insights:
-                st.markdown('<div class="section-header">AI-Generated Insights & Recommendations</div>', unsafe_allow_html=True)
-                insights = create_insights(marketing_df, business_df, selected_date_range)
+            if tab_is_open(tab5):
+                st.markdown('<div class="section-header">Campaign Drill-Down</div>', unsafe_allow_html=True)
                 
-                for i, insight in enumerate(insights, 1):
-                    st.markdown(f'<div class="insight-box">{insight}</div>', unsafe_allow_html=True)
-            else:
-                st.info("💡 Enable 'Show Insights' in the sidebar to view AI-generated recommendations")
+                # Ranking controls; the ranking is read from the campaign index
+                rank_col, order_col, count_col = st.columns(3)
+                with rank_col:
+                    rank_by = st.selectbox("Rank By", options=list(CAMPAIGN_RANK_METRICS), index=0)
+                with order_col:
+                    order = st.radio("Show", options=['Top', 'Bottom'], horizontal=True)
+                with count_col:
+                    num_campaigns = st.slider("Campaigns", min_value=5, max_value=50, value=10, step=5)
+                
+                campaign_fig, campaign_summary = cached_view(
+                    'campaign_drilldown', dataset_version, filter_spec,
+                    lambda: create_campaign_drilldown(
+                        marketing_df, kpi_prefix_sums, filter_spec, rank_by, num_campaigns, order == 'Bottom'
+                    ),
+                    options=(rank_by, order, num_campaigns)
+                )
+                if campaign_fig:
+                    render_chart(campaign_fig, 'campaign_drilldown')
+                    st.dataframe(campaign_summary, width='stretch')
+        
+        with tab6:
+            if tab_is_open(tab6):
+                if show_insights:
+                    st.markdown('<div class="section-header">AI-Generated Insights & Recommendations</div>', unsafe_allow_html=True)
+                    insights = cached_view(
+                        'insights', dataset_version, filter_spec,
+                        lambda: generate_insights(marketing_cube, business_df, filter_spec)
+                    )
+                    
+                    insights_timer = start_stages('insights')
+                    for i, insight in enumerate(insights, 1):
+                        st.markdown(f'<div class="insight-box">{insight}</div>', unsafe_allow_html=True)
+                    insights_timer.lap('render')
+                else:
+                    st.info("💡 Enable 'Show Insights' in the sidebar to view AI-generated recommendations")
     
     # Footer
     st.markdown("---")
@@ -1064,6 +1351,12 @@ def main():
         <em>Real-time analytics for data-driven marketing decisions</em>
     </div>
     """, unsafe_allow_html=True)
+    
+    rerun_timings = finish_rerun()
+    if rerun_timings is not None:
+        if METRICS_FILE:
+            write_prometheus_file(METRICS_FILE, prometheus_text() + get_view_cache().prometheus_text())
+        create_diagnostics_panel(rerun_timings)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,46 @@
+"""
+Metric definitions for the Marketing Intelligence Dashboard.
+
+Every ratio is a sum over a sum of additive base measures, so it can be
+derived from any roll-up (cube cells, per-dimension totals, prefix sums)
+and always agrees with the totals shown next to it. Ratios are never
+stored; they are derived wherever totals are read.
+"""
+import numpy as np
+import pandas as pd
+
+# Ratio name -> (numerator measure, denominator measure, scale)
+MARKETING_RATIOS = {
+    'roas': ('attributed_revenue', 'spend', 1),
+    'ctr': ('clicks', 'impressions', 100),
+    'cpc': ('spend', 'clicks', 1),
+    'cpm': ('spend', 'impressions', 1000)
+}
+BUSINESS_RATIOS = {
+    'aov': ('total_revenue', 'orders', 1),
+    'profit_margin': ('gross_profit', 'total_revenue', 100)
+}
+
+
+def ratio(numerator, denominator, scale=1):
+    """numerator / denominator * scale, or 0 where the denominator is 0"""
+    num = np.asarray(numerator, dtype='float64')
+    den = np.asarray(denominator, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(den != 0, num * scale / den, 0.0)
+
+    if isinstance(numerator, pd.Series):
+        return pd.Series(values, index=numerator.index)
+    return float(values) if values.ndim == 0 else values
+
+
+def add_ratios(totals, ratios, names=None):
+    """Derive ratios from additive totals: columns of a frame, or entries of a Series"""
+    derived = {
+        name: ratio(totals[numerator], totals[denominator], scale)
+        for name, (numerator, denominator, scale) in ratios.items()
+        if names is None or name in names
+    }
+    if isinstance(totals, pd.DataFrame):
+        return totals.assign(**derived)
+    return pd.concat([totals, pd.Series(derived, dtype='float64')])
@@ -0,0 +1,84 @@
+"""
+Bounded LRU cache for computed dashboard views.
+
+One instance is shared by every session of a Streamlit process. Entries are
+keyed by the view, the dataset version and the normalized filters, so
+filter combinations that many users share (e.g. every platform over the
+full date range) are computed once and then served from memory until they
+fall out of the cache.
+"""
+from collections import OrderedDict
+import threading
+
+
+class LRUResultCache:
+    """Thread-safe LRU cache of computed results with per-view hit/miss counters"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """Return the cached result for key, computing and storing it on a miss
+
+        Keys are tuples whose first item names the view. Results rejected
+        by cacheable (e.g. empty results that report a warning when
+        computed) are returned but not stored.
+        """
+        view = key[0]
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits[view] = self.hits.get(view, 0) + 1
+                return self.entries[key]
+            self.misses[view] = self.misses.get(view, 0) + 1
+
+        # Computed outside the lock so one slow view doesn't block the others
+        result = compute()
+
+        if self.max_entries > 0 and (cacheable is None or cacheable(result)):
+            with self.lock:
+                self.entries[key] = result
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        return result
+
+    def stats(self):
+        """Hit and miss counts per view plus the cache occupancy"""
+        with self.lock:
+            views = sorted(set(self.hits) | set(self.misses))
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'evictions': self.evictions,
+                'views': {
+                    view: {'hits': self.hits.get(view, 0), 'misses': self.misses.get(view, 0)}
+                    for view in views
+                }
+            }
+
+    def prometheus_text(self, name='dashboard_view_cache'):
+        """Counters in the Prometheus text format"""
+        stats = self.stats()
+        lines = [
+            f'# HELP {name}_requests_total View results served from the cache (hit) or computed (miss).',
+            f'# TYPE {name}_requests_total counter'
+        ]
+        for view, counts in stats['views'].items():
+            lines.append(f'{name}_requests_total{{view="{view}",result="hit"}} {counts["hits"]}')
+            lines.append(f'{name}_requests_total{{view="{view}",result="miss"}} {counts["misses"]}')
+        lines += [
+            f'# HELP {name}_evictions_total Results evicted to stay within the size bound.',
+            f'# TYPE {name}_evictions_total counter',
+            f'{name}_evictions_total {stats["evictions"]}',
+            f'# HELP {name}_entries Results currently cached.',
+            f'# TYPE {name}_entries gauge',
+            f'{name}_entries {stats["entries"]}'
+        ]
+        return '\n'.join(lines) + '\n'
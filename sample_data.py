@@ -0,0 +1,106 @@
+"""
+Synthetic data for the Marketing Intelligence Dashboard.
+
+generate_sample_data draws whole columns at once from a seeded NumPy
+Generator, so demo datasets and load-test datasets of tens of millions of
+rows are built at array speed. Its output has the columns of the platform
+and business CSVs; dimensions come out categorical.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_START_DATE = datetime(2024, 1, 1)
+SAMPLE_PLATFORMS = ['Facebook', 'Google', 'TikTok']
+SAMPLE_TACTICS = ['Search', 'Display', 'Video', 'Shopping', 'Discovery', 'App Install']
+SAMPLE_STATES = [
+    'CA', 'NY', 'TX', 'FL', 'IL', 'PA', 'OH', 'GA', 'NC', 'MI',
+    'NJ', 'VA', 'WA', 'AZ', 'MA', 'TN', 'IN', 'MO', 'MD', 'WI',
+    'CO', 'MN', 'SC', 'AL', 'LA', 'KY', 'OR', 'OK', 'CT', 'UT',
+    'IA', 'NV', 'AR', 'MS', 'KS', 'NM', 'NE', 'ID', 'WV', 'HI',
+    'NH', 'ME', 'MT', 'RI', 'DE', 'SD', 'ND', 'AK', 'VT', 'WY'
+]
+
+# Share of (date, campaign) cells that have a row
+SAMPLE_DENSITY = 0.3
+
+# Candidate cells drawn per block, which bounds the generator's scratch memory
+SAMPLE_BLOCK_CELLS = 1 << 22
+
+
+def sample_states(states):
+    """State codes for a state count, numbering extra regions past the 50 states"""
+    extra = [f'R{i:03d}' for i in range(max(0, states - len(SAMPLE_STATES)))]
+    return (SAMPLE_STATES + extra)[:states]
+
+
+def sample_cell_indices(rng, total_cells):
+    """Flat indices of the candidate cells that have a row, in ascending order"""
+    blocks = []
+    for start in range(0, total_cells, SAMPLE_BLOCK_CELLS):
+        size = min(SAMPLE_BLOCK_CELLS, total_cells - start)
+        hits = np.flatnonzero(rng.random(size, dtype=np.float32) < SAMPLE_DENSITY)
+        blocks.append(hits + start)
+    return np.concatenate(blocks) if blocks else np.empty(0, dtype=np.int64)
+
+
+def generate_sample_data(days=120, states=10, campaigns=1, seed=42):
+    """Generate sample marketing and business data for demonstration and load tests
+
+    Every platform runs `campaigns` campaigns per tactic and state, and each
+    of those has a row on roughly 30% of the `days` days. The same seed
+    always produces the same data.
+    """
+    rng = np.random.default_rng(seed)
+    state_names = sample_states(states)
+    shape = (days, len(SAMPLE_PLATFORMS), len(SAMPLE_TACTICS), len(state_names), campaigns)
+
+    # Decompose the sampled cells back into their coordinates; cells are
+    # drawn in date order, so both frames come out sorted by date
+    cells = sample_cell_indices(rng, int(np.prod(shape)))
+    day, platform, tactic, state, campaign = np.unravel_index(cells, shape)
+    campaign_code = np.ravel_multi_index((platform, tactic, state, campaign), shape[1:])
+    rows = len(cells)
+
+    # Campaign names follow the platform_tactic_state pattern, numbered when
+    # a cell has more than one campaign
+    campaign_names = [
+        f'{p}_{t}_{s}' if campaigns == 1 else f'{p}_{t}_{s}_{c + 1}'
+        for p in SAMPLE_PLATFORMS for t in SAMPLE_TACTICS for s in state_names for c in range(campaigns)
+    ]
+
+    dates = (np.datetime64(SAMPLE_START_DATE, 'D') + np.arange(days)).astype('datetime64[ns]')
+    spend = rng.uniform(50, 2000, rows)
+    revenue = spend * rng.uniform(2, 8, rows)
+
+    marketing_df = pd.DataFrame({
+        'date': pd.DatetimeIndex(dates[day]),
+        'platform': pd.Categorical.from_codes(platform, SAMPLE_PLATFORMS),
+        'tactic': pd.Categorical.from_codes(tactic, SAMPLE_TACTICS),
+        'state': pd.Categorical.from_codes(state, state_names),
+        'campaign': pd.Categorical.from_codes(campaign_code, campaign_names),
+        'impressions': rng.integers(1000, 50000, rows, dtype=np.int32),
+        'clicks': rng.integers(10, 500, rows, dtype=np.int32),
+        'spend': spend.round(2),
+        'attributed_revenue': revenue.round(2)
+    })
+
+    # Generate business data
+    orders = rng.integers(50, 200, days)
+    new_orders = (orders * rng.uniform(0.6, 0.9, days)).astype(np.int64)
+    new_customers = (new_orders * rng.uniform(0.7, 0.95, days)).astype(np.int64)
+    total_revenue = rng.uniform(10000, 50000, days)
+    gross_profit = total_revenue * rng.uniform(0.3, 0.5, days)
+
+    business_df = pd.DataFrame({
+        'date': pd.DatetimeIndex(dates),
+        'orders': orders,
+        'new_orders': new_orders,
+        'new_customers': new_customers,
+        'total_revenue': total_revenue.round(2),
+        'gross_profit': gross_profit.round(2),
+        'cogs': (total_revenue - gross_profit).round(2)
+    })
+
+    return marketing_df, business_df
@@ -0,0 +1,201 @@
+"""
+Regression tests for the analytics engine: cube cell selection and the
+per-dimension summaries must match a naive date/isin mask over the raw
+marketing rows for any window and platform/tactic selection.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics
+from data_loader import UNKNOWN_LABEL, build_marketing_cube, concat_frames, process_marketing_rows
+from sample_data import generate_sample_data
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+SHIPPED_PLATFORMS = ['Facebook', 'Google', 'TikTok']
+
+
+def shipped_data():
+    """Raw rows, cube and prefix sums of the CSVs shipped with the repo"""
+    marketing_df = concat_frames([
+        process_marketing_rows(pd.read_csv(os.path.join(DATA_DIR, f'{platform}.csv')), platform)
+        for platform in SHIPPED_PLATFORMS
+    ])
+    business_df = pd.read_csv(os.path.join(DATA_DIR, 'Business.csv'), parse_dates=['date'])
+    return load(marketing_df, business_df)
+
+
+def sample_data():
+    """Raw rows, cube and prefix sums of a synthetic dataset spanning several years"""
+    marketing_df, business_df = generate_sample_data(800, 6, 2, 7)
+    return load(marketing_df, business_df)
+
+
+def load(marketing_df, business_df):
+    marketing_df = marketing_df.sort_values('date', kind='stable', ignore_index=True)
+    business_df = business_df.sort_values('date', kind='stable', ignore_index=True)
+    marketing_cube = build_marketing_cube(marketing_df)
+    kpi_prefix_sums = analytics.build_kpi_prefix_sums(marketing_cube, business_df, marketing_df)
+    return marketing_df, marketing_cube, kpi_prefix_sums
+
+
+def naive_rows(marketing_df, filter_spec):
+    """Raw rows selected by a date/isin mask"""
+    mask = marketing_df['date'].between(filter_spec.start_date, filter_spec.end_date)
+    if filter_spec.platforms is not None:
+        mask &= marketing_df['platform'].isin(filter_spec.platforms)
+    if filter_spec.tactics is not None:
+        mask &= marketing_df['tactic'].isin(filter_spec.tactics)
+    return marketing_df[mask].astype({'spend': 'float64', 'attributed_revenue': 'float64'})
+
+
+def naive_totals(marketing_df, filter_spec, dimension):
+    """Spend and revenue per dimension value of the naively selected rows"""
+    rows = naive_rows(marketing_df, filter_spec)
+    return rows.groupby(dimension, observed=True)[['spend', 'attributed_revenue']].sum()
+
+
+def random_specs(kpi_prefix_sums, marketing_cube, count, seed):
+    """Filter specs over random windows and random platform/tactic selections"""
+    rng = np.random.default_rng(seed)
+    first_date, last_date = analytics.data_date_bounds(kpi_prefix_sums)
+    days = pd.date_range(first_date, last_date)
+    platforms = sorted(marketing_cube['platform'].unique())
+    tactics = sorted(marketing_cube['tactic'].unique())
+
+    for _ in range(count):
+        start, end = sorted(rng.choice(len(days), 2))
+        selected_platforms = platforms if rng.random() < 0.5 else list(
+            rng.choice(platforms, rng.integers(1, len(platforms) + 1), replace=False)
+        )
+        selected_tactics = tactics if rng.random() < 0.5 else list(
+            rng.choice(tactics, rng.integers(1, len(tactics) + 1), replace=False)
+        )
+        yield analytics.make_filter_spec(
+            kpi_prefix_sums, (days[start], days[end]), selected_platforms, selected_tactics
+        )
+
+
+def assert_matches_naive(marketing_df, marketing_cube, filter_spec):
+    # Every selected cell, and nothing else
+    cells = analytics.select_cells(marketing_cube, filter_spec)
+    rows = naive_rows(marketing_df, filter_spec)
+    assert cells['rows'].sum() == len(rows)
+    assert cells['spend'].sum() == pytest.approx(rows['spend'].sum(), rel=1e-6, abs=1e-3)
+
+    for summarize, dimension in (
+        (analytics.summarize_platforms, 'platform'),
+        (analytics.summarize_tactics, 'tactic'),
+        (analytics.summarize_states, 'state')
+    ):
+        summary = summarize(marketing_cube, filter_spec)
+        expected = naive_totals(marketing_df, filter_spec, dimension)
+        if expected.empty:
+            assert summary.status != analytics.STATUS_OK
+            continue
+        table = summary.table.reindex(expected.index)
+        np.testing.assert_allclose(table['spend'], expected['spend'].round(2), atol=0.01)
+        np.testing.assert_allclose(table['attributed_revenue'], expected['attributed_revenue'].round(2), atol=0.01)
+
+
+def test_trimmed_window_over_every_platform_keeps_one_range_per_platform():
+    marketing_df, marketing_cube, kpi_prefix_sums = shipped_data()
+    platforms = list(marketing_cube['platform'].unique())
+    tactics = list(marketing_cube['tactic'].unique())
+    filter_spec = analytics.make_filter_spec(
+        kpi_prefix_sums, ('2024-01-15', '2024-04-20'), platforms, tactics
+    )
+
+    assert len(filter_spec.row_ranges) == len(platforms)
+    assert_matches_naive(marketing_df, marketing_cube, filter_spec)
+
+
+def test_two_platforms_over_trimmed_window():
+    marketing_df, marketing_cube, kpi_prefix_sums = shipped_data()
+    tactics = list(marketing_cube['tactic'].unique())
+    filter_spec = analytics.make_filter_spec(
+        kpi_prefix_sums, ('2024-01-15', '2024-04-01'), ['Google', 'TikTok'], tactics
+    )
+
+    summary = analytics.summarize_platforms(marketing_cube, filter_spec)
+    assert set(summary.table.index) == {'Google', 'TikTok'}
+    assert_matches_naive(marketing_df, marketing_cube, filter_spec)
+
+
+@pytest.mark.parametrize('load_data', [shipped_data, sample_data])
+def test_selection_matches_naive_mask(load_data):
+    marketing_df, marketing_cube, kpi_prefix_sums = load_data()
+    for filter_spec in random_specs(kpi_prefix_sums, marketing_cube, 100, seed=0):
+        assert_matches_naive(marketing_df, marketing_cube, filter_spec)
+
+
+def naive_campaign_totals(marketing_df, filter_spec):
+    """Spend and revenue per campaign of the naively selected rows"""
+    rows = naive_rows(marketing_df, filter_spec)
+    return rows.groupby('campaign', observed=True)[['spend', 'attributed_revenue']].sum()
+
+
+def test_extended_campaign_index_matches_naive_ranking():
+    marketing_df, business_df = generate_sample_data(400, 4, 2, 11)
+    marketing_df = marketing_df.sort_values('date', kind='stable', ignore_index=True)
+
+    # Three appends, the last one cutting a month in half and bringing a
+    # campaign the index has not seen
+    bounds = np.searchsorted(
+        marketing_df['date'].to_numpy(), pd.to_datetime(['2024-03-01', '2024-09-15']).to_numpy()
+    )
+    chunks = [marketing_df.iloc[:bounds[0]], marketing_df.iloc[bounds[0]:bounds[1]], marketing_df.iloc[bounds[1]:].copy()]
+    chunks[2]['campaign'] = chunks[2]['campaign'].astype(object).where(
+        chunks[2]['campaign'] != chunks[2]['campaign'].iloc[0], 'New_Campaign'
+    ).astype('category')
+    marketing_df = concat_frames(chunks)
+
+    campaign_index = None
+    for chunk in chunks:
+        campaign_index = analytics.extend_campaign_index(campaign_index, chunk)
+    marketing_cube = build_marketing_cube(marketing_df)
+    kpi_prefix_sums = analytics.build_kpi_prefix_sums(marketing_cube, business_df, marketing_df, campaign_index)
+
+    for filter_spec in random_specs(kpi_prefix_sums, marketing_cube, 50, seed=1):
+        expected = naive_campaign_totals(marketing_df, filter_spec)
+        summary = analytics.rank_campaigns(marketing_df, kpi_prefix_sums, filter_spec, 'spend', k=len(expected) or 1)
+        if expected.empty:
+            assert summary.status != analytics.STATUS_OK
+            continue
+        table = summary.table.reindex(expected.index)
+        np.testing.assert_allclose(table['spend'], expected['spend'].round(2), atol=0.01)
+        np.testing.assert_allclose(table['attributed_revenue'], expected['attributed_revenue'].round(2), atol=0.01)
+
+
+def test_campaign_index_labels_missing_dimensions_unknown():
+    marketing_df, business_df = generate_sample_data(90, 3, 1, 5)
+    marketing_df = marketing_df.sort_values('date', kind='stable', ignore_index=True)
+
+    # Blank campaigns and tactics, including rows of the first platform and
+    # tactic, whose -1 codes would flatten to an out-of-bounds cell
+    first_block = marketing_df.index[
+        (marketing_df['platform'] == marketing_df['platform'].cat.categories[0])
+        & (marketing_df['tactic'] == marketing_df['tactic'].cat.categories[0])
+    ]
+    marketing_df.loc[first_block[:5], 'campaign'] = np.nan
+    marketing_df.loc[marketing_df.index[::97], 'campaign'] = np.nan
+    marketing_df.loc[marketing_df.index[::89], 'tactic'] = np.nan
+
+    campaign_index = analytics.build_campaign_index(marketing_df)
+    filled = marketing_df.assign(
+        campaign=marketing_df['campaign'].astype(object).fillna(UNKNOWN_LABEL),
+        tactic=marketing_df['tactic'].astype(object).fillna(UNKNOWN_LABEL)
+    )
+    marketing_cube = build_marketing_cube(filled)
+    kpi_prefix_sums = analytics.build_kpi_prefix_sums(marketing_cube, business_df, marketing_df, campaign_index)
+
+    for filter_spec in random_specs(kpi_prefix_sums, marketing_cube, 30, seed=2):
+        expected = naive_campaign_totals(filled, filter_spec)
+        summary = analytics.rank_campaigns(marketing_df, kpi_prefix_sums, filter_spec, 'spend', k=len(expected) or 1)
+        if expected.empty:
+            assert summary.status != analytics.STATUS_OK
+            continue
+        table = summary.table.reindex(expected.index)
+        np.testing.assert_allclose(table['spend'], expected['spend'].round(2), atol=0.01)
@@ -0,0 +1,177 @@
+"""
+Tests for loading: blank dimension values in the exports, incremental
+reads of appended CSVs, cubes built chunk by chunk and pruning of
+memory-mapped stores.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import (
+    CUBE_MEASURES,
+    CUBE_ORDER,
+    STALE_STORE_SECONDS,
+    AppendOnlySource,
+    CubeAccumulator,
+    UNKNOWN_LABEL,
+    build_marketing_cube,
+    open_mmap_store,
+    parse_marketing_csv,
+    write_mmap_store
+)
+from sample_data import generate_sample_data
+
+MARKETING_CSV = (
+    'date,tactic,state,campaign,impressions,clicks,spend,attributed_revenue\n'
+    '2024-01-01,Search,NY,G_Search_NY,1000,10,100.0,400.0\n'
+    '2024-01-01,,NY,G_Blank_NY,2000,20,200.0,300.0\n'
+    '2024-01-02,Video,,G_Video_TX,3000,30,300.0,900.0\n'
+    '2024-01-02,Video,TX,,4000,40,400.0,800.0\n'
+)
+
+
+def write_csv(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_blank_dimensions_are_labelled_unknown(tmp_path):
+    marketing_df = parse_marketing_csv(write_csv(tmp_path, 'Google.csv', MARKETING_CSV), 'Google')
+
+    for column in ['tactic', 'state', 'campaign']:
+        assert marketing_df[column].isna().sum() == 0
+        assert (marketing_df[column] == UNKNOWN_LABEL).sum() == 1
+
+
+def test_cube_keeps_rows_with_blank_dimensions(tmp_path):
+    marketing_df = parse_marketing_csv(write_csv(tmp_path, 'Google.csv', MARKETING_CSV), 'Google')
+    marketing_cube = build_marketing_cube(marketing_df)
+
+    assert marketing_cube['rows'].sum() == len(marketing_df)
+    assert marketing_cube['spend'].sum() == pd.read_csv(tmp_path / 'Google.csv')['spend'].sum()
+
+
+def test_newer_store_keeps_recent_stores_of_other_versions(tmp_path):
+    frames = {'business': pd.DataFrame({'orders': [1, 2]})}
+    old_store = str(tmp_path / 'mmap-v6-old')
+    new_store = str(tmp_path / 'mmap-v6-new')
+    write_mmap_store(frames, old_store)
+    write_mmap_store(frames, new_store)
+
+    # A process that found the old store before the new one was published can still open it
+    assert open_mmap_store(old_store)['business']['orders'].tolist() == [1, 2]
+
+    # Once past the age threshold it is removed by the next publish
+    stale_time = time.time() - STALE_STORE_SECONDS - 1
+    os.utime(old_store, (stale_time, stale_time))
+    write_mmap_store(frames, str(tmp_path / 'mmap-v6-newer'))
+    assert not os.path.exists(old_store)
+    assert os.path.isdir(new_store)
+
+
+def append_text(path, text):
+    with open(path, 'a') as f:
+        f.write(text)
+
+
+def append_only_source(path, load_cached=None):
+    return AppendOnlySource(str(path), lambda rows: rows, load_cached)
+
+
+def test_append_only_source_reads_only_appended_rows(tmp_path):
+    path = tmp_path / 'Google.csv'
+    path.write_text('date,spend\n2024-01-01,1\n2024-01-02,2\n')
+    source = append_only_source(path, lambda source_path: pd.read_csv(source_path))
+
+    rows, rewritten = source.read_rows()
+    assert rows['spend'].tolist() == [1, 2] and not rewritten
+    assert source.read_rows() == (None, False)
+
+    append_text(path, '2024-01-03,3\n')
+    rows, rewritten = source.read_rows()
+    assert rows['spend'].tolist() == [3] and not rewritten
+    assert list(rows.columns) == ['date', 'spend']
+
+
+def test_append_only_source_leaves_partial_line_for_next_read(tmp_path):
+    path = tmp_path / 'Google.csv'
+    path.write_text('date,spend\n2024-01-01,1\n')
+    source = append_only_source(path)
+    source.read_rows()
+
+    append_text(path, '2024-01-02,2\n2024-01-03,')
+    rows, _ = source.read_rows()
+    assert rows['spend'].tolist() == [2]
+
+    append_text(path, '3\n')
+    rows, _ = source.read_rows()
+    assert rows['spend'].tolist() == [3]
+
+
+def test_append_only_source_rereads_rewritten_file(tmp_path):
+    path = tmp_path / 'Google.csv'
+    path.write_text('date,spend\n2024-01-01,1\n2024-01-02,2\n')
+    source = append_only_source(path)
+    source.read_rows()
+
+    # Same length, different bytes before the offset
+    path.write_text('date,spend\n2024-01-01,7\n2024-01-02,8\n2024-01-03,9\n')
+    rows, rewritten = source.read_rows()
+    assert rewritten
+    assert rows['spend'].tolist() == [7, 8, 9]
+
+    # Shorter than what was read
+    path.write_text('date,spend\n2024-02-01,5\n')
+    rows, rewritten = source.read_rows()
+    assert rewritten
+    assert rows['spend'].tolist() == [5]
+
+
+def test_rows_appended_while_loading_from_cache_are_read_once(tmp_path):
+    path = tmp_path / 'Google.csv'
+    path.write_text('date,spend\n2024-01-01,1\n2024-01-02,2\n')
+
+    def load_cached_while_appending(source_path):
+        # The export grows between the size check and the cached load
+        append_text(source_path, '2024-01-03,3\n')
+        return pd.read_csv(source_path)
+
+    source = append_only_source(path, load_cached_while_appending)
+    first_rows, _ = source.read_rows()
+    later_rows, _ = source.read_rows()
+
+    ingested = pd.concat([first_rows, later_rows])
+    assert ingested['spend'].tolist() == [1, 2, 3]
+
+
+def sorted_cells(marketing_cube):
+    cells = marketing_cube.astype({dim: object for dim in CUBE_ORDER if dim != 'date'})
+    return cells.sort_values(CUBE_ORDER, ignore_index=True)[CUBE_ORDER + CUBE_MEASURES]
+
+
+@pytest.mark.parametrize('shuffled', [False, True])
+def test_cube_accumulator_matches_cube_of_all_rows(shuffled):
+    marketing_df, _ = generate_sample_data(120, 4, 1, 3)
+    if shuffled:
+        # An export that isn't date sorted reopens blocks already finalized
+        marketing_df = marketing_df.sample(frac=1, random_state=0)
+    else:
+        marketing_df = marketing_df.sort_values(['platform', 'date'], kind='stable')
+
+    cube_accumulator = CubeAccumulator()
+    for chunk in np.array_split(np.arange(len(marketing_df)), 37):
+        cube_accumulator.add(build_marketing_cube(marketing_df.iloc[chunk]))
+
+    marketing_cube = cube_accumulator.cube()
+    expected = sorted_cells(build_marketing_cube(marketing_df))
+    pd.testing.assert_frame_equal(sorted_cells(marketing_cube), expected, check_dtype=False)
+
+    # Clustered: each platform one run of rows, in date order
+    platforms = marketing_cube['platform'].astype(object).to_numpy()
+    assert (platforms[1:] != platforms[:-1]).sum() == marketing_cube['platform'].nunique() - 1
+    for _, cells in marketing_cube.groupby('platform', observed=True):
+        assert cells['date'].is_monotonic_increasing